@@ -0,0 +1,243 @@
+"""
+LLM 接口的准入控制
+
+每个请求依次经过：
+  1. 单用户令牌桶（登录用户按 id，匿名用户按 IP，每个接口分开），平滑单个用户 / 脚本的突发流量；
+     会合并到进行中相同请求的请求跳过这一步
+真正调用模型的请求（合并请求中只有 leader）再经过 llm_admission()：
+  2. 全局令牌桶，限制整体打到 DashScope 的速率
+  3. LLM 并发槽位：不同优先级通道最多只能占用一定比例的槽位，
+     高负载时先拒绝匿名流量，为登录用户和优先用户保留容量
+  4. 每日配额：在 UserStats.daily_usage_count / last_usage_date 上做原子的条件 UPDATE
+
+任何一步被拒绝都返回 429 和 Retry-After。令牌桶和槽位都在进程内。
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import current_app, jsonify, request
+from flask_login import current_user
+from sqlalchemy import case, or_
+
+from models import db, UserStats
+
+class AdmissionRejected(Exception):
+    """LLM 并发槽位已满"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.message = message
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """经典令牌桶：rate 为每秒补充的令牌数，capacity 为桶容量"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, tokens=1):
+        """成功返回 (True, 0)，失败返回 (False, 需要等待的秒数)"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True, 0
+            return False, (tokens - self.tokens) / self.rate if self.rate else float('inf')
+
+class SlotPool:
+    """LLM 并发槽位，每个通道最多占用 share * max_inflight 个"""
+
+    def __init__(self, max_inflight):
+        self.max_inflight = max_inflight
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self, share):
+        with self._lock:
+            if self.in_flight < max(1, int(self.max_inflight * share)):
+                self.in_flight += 1
+                return True
+            return False
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+class AdmissionController:
+    def __init__(self, lanes, global_rate, global_burst, max_inflight, max_tracked_clients=10000):
+        self.lanes = lanes
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.slots = SlotPool(max_inflight)
+        self.max_tracked_clients = max_tracked_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.rejected = {}
+
+    def client_bucket(self, lane, endpoint, client_key):
+        """取出（或创建）某个客户端在某个接口上的令牌桶，超过上限时淘汰最久未用的"""
+        key = (lane, endpoint, client_key)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                config = self.lanes[lane]
+                bucket = TokenBucket(config['rate'], config['burst'])
+                self._buckets[key] = bucket
+                while len(self._buckets) > self.max_tracked_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket
+
+    def count_rejection(self, reason):
+        with self._lock:
+            self.rejected[reason] = self.rejected.get(reason, 0) + 1
+
+def get_controller():
+    return current_app.extensions['admission']
+
+def current_lane():
+    """确定当前请求所属的优先级通道"""
+    if not current_user.is_authenticated:
+        return 'anonymous'
+    if current_user.username in current_app.config.get('ADMISSION_PRIORITY_USERS', ()):
+        return 'priority'
+    return 'user'
+
+def seconds_until_tomorrow():
+    now = datetime.utcnow()
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return (tomorrow - now).total_seconds()
+
+def consume_daily_quota(user_id, limit):
+    """
+    原子地把当日用量加一；已达到 limit 时返回 False。
+    跨天时由同一条 UPDATE 把计数重置为 1
+    """
+    today = datetime.utcnow().date()
+    update = UserStats.__table__.update()\
+        .where(UserStats.user_id == user_id)\
+        .where(or_(UserStats.last_usage_date.is_(None),
+                   UserStats.last_usage_date != today,
+                   UserStats.daily_usage_count < limit))\
+        .values(
+            daily_usage_count=case(
+                (UserStats.last_usage_date == today, UserStats.daily_usage_count + 1),
+                else_=1
+            ),
+            last_usage_date=today
+        )
+
+    result = db.session.execute(update)
+    if result.rowcount == 0 and not UserStats.query.filter_by(user_id=user_id).first():
+        # 老用户可能没有统计记录，补建后再试一次
+        db.session.add(UserStats(user_id=user_id))
+        db.session.flush()
+        result = db.session.execute(update)
+    db.session.commit()
+    return result.rowcount == 1
+
+def too_many_requests(message, retry_after):
+    retry_after = max(1, math.ceil(retry_after))
+    response = jsonify({'error': message, 'retry_after': retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+@contextmanager
+def llm_slot():
+    """占用当前请求所属通道的一个 LLM 并发槽位，已满时抛出 AdmissionRejected"""
+    if not current_app.config.get('ADMISSION_ENABLED', True):
+        yield
+        return
+
+    controller = get_controller()
+    if not controller.slots.try_acquire(controller.lanes[current_lane()]['slot_share']):
+        controller.count_rejection('slots')
+        raise AdmissionRejected('服务器繁忙，请稍后再试',
+                                current_app.config.get('ADMISSION_SLOT_RETRY_AFTER', 5))
+    try:
+        yield
+    finally:
+        controller.slots.release()
+
+@contextmanager
+def llm_admission(counts_toward_quota=True):
+    """
+    真正调用模型之前的准入：全局令牌桶、LLM 并发槽位、每日配额（拿到槽位后才扣，
+    槽位已满时不浪费配额）。被拒绝时抛出 AdmissionRejected。
+    合并到进行中相同请求的 follower 不进入这里，不消耗全局令牌和配额
+    """
+    if not current_app.config.get('ADMISSION_ENABLED', True):
+        yield
+        return
+
+    controller = get_controller()
+    allowed, wait = controller.global_bucket.try_acquire()
+    if not allowed:
+        controller.count_rejection('global_rate')
+        raise AdmissionRejected('服务器繁忙，请稍后再试', wait)
+
+    with llm_slot():
+        quota = controller.lanes[current_lane()].get('daily_quota')
+        if counts_toward_quota and current_user.is_authenticated and quota:
+            if not consume_daily_quota(current_user.id, quota):
+                controller.count_rejection('daily_quota')
+                raise AdmissionRejected('今日批改次数已用完，请明天再试', seconds_until_tomorrow())
+        yield
+
+def admission_controlled(counts_toward_quota=True, reserve_slot=True, joins_in_flight=None):
+    """
+    为调用 LLM 的接口加上准入控制（OPTIONS 预检请求直接放行）。
+    装饰器本身只检查单用户令牌桶，每个接口各用一个桶（追问不会用掉批改的突发额度）；
+    joins_in_flight() 返回 True 的请求会合并到进行中的相同调用，不检查令牌桶。reserve_slot 为 True 时整个视图在 llm_admission() 中执行，
+    为 False 的接口需要自己在真正调用模型时进入 llm_admission()（例如只有合并请求的 leader 进入）。
+    counts_toward_quota 为 False 的接口不计入每日配额
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method == 'OPTIONS' or not current_app.config.get('ADMISSION_ENABLED', True):
+                return view(*args, **kwargs)
+
+            controller = get_controller()
+            lane = current_lane()
+            client_key = current_user.id if current_user.is_authenticated else request.remote_addr
+
+            if joins_in_flight is not None and joins_in_flight():
+                # 会合并到进行中的相同调用，不产生新的模型调用，不受单用户限流
+                return view(*args, **kwargs)
+
+            allowed, wait = controller.client_bucket(lane, request.endpoint, client_key).try_acquire()
+            if not allowed:
+                controller.count_rejection('client_rate')
+                return too_many_requests('请求过于频繁，请稍后再试', wait)
+
+            if not reserve_slot:
+                return view(*args, **kwargs)
+            try:
+                with llm_admission(counts_toward_quota):
+                    return view(*args, **kwargs)
+            except AdmissionRejected as e:
+                return too_many_requests(e.message, e.retry_after)
+        return wrapper
+    return decorator
+
+def init_app(app):
+    app.extensions['admission'] = AdmissionController(
+        lanes=app.config['ADMISSION_LANES'],
+        global_rate=app.config['ADMISSION_GLOBAL_RATE'],
+        global_burst=app.config['ADMISSION_GLOBAL_BURST'],
+        max_inflight=app.config['ADMISSION_MAX_INFLIGHT']
+    )
@@ -0,0 +1,66 @@
+"""
+错误类型统计：基于 CorrectionEntry 索引表的 SQL 聚合，不需要解析 Essay 中的 JSON
+"""
+
+from sqlalchemy import func
+
+from models import db, Essay, CorrectionEntry
+import archive
+
+def top_error_types(user_id=None, kind=None, since=None, until=None, limit=5):
+    """
+    返回出现次数最多的错误类型：[{'error_type', 'kind', 'count', 'essays'}]
+    user_id 为 None 时统计全部用户
+    """
+    query = db.session.query(
+        CorrectionEntry.error_type,
+        CorrectionEntry.kind,
+        func.count(CorrectionEntry.id).label('count'),
+        func.count(func.distinct(CorrectionEntry.essay_id)).label('essays')
+    )
+    if user_id is not None:
+        query = query.filter(CorrectionEntry.user_id == user_id)
+    if kind:
+        query = query.filter(CorrectionEntry.kind == kind)
+    if since:
+        query = query.filter(CorrectionEntry.created_at >= since)
+    if until:
+        # until 是不包含的上界（调用方传入次日零点）
+        query = query.filter(CorrectionEntry.created_at < until)
+
+    rows = query.group_by(CorrectionEntry.error_type, CorrectionEntry.kind)\
+                .order_by(func.count(CorrectionEntry.id).desc())\
+                .limit(limit)\
+                .all()
+    return [
+        {'error_type': row.error_type, 'kind': row.kind, 'count': row.count, 'essays': row.essays}
+        for row in rows
+    ]
+
+def backfill_correction_index(batch_size=500, fallback_feedback=None):
+    """
+    为还没有索引记录的历史作文补建 CorrectionEntry，返回处理的作文篇数。
+    总体反馈等于 fallback 文本的记录是模型调用失败时的占位结果，其中的示例纠错不建索引
+    """
+    indexed = db.session.query(CorrectionEntry.essay_id).distinct()
+    pending = Essay.query.filter(~Essay.id.in_(indexed)).order_by(Essay.id)
+    if fallback_feedback:
+        # 已归档作文热表中的 overall_feedback 为空，读回冷数据后再判断
+        pending = pending.filter(db.or_(Essay.overall_feedback.is_(None),
+                                        Essay.overall_feedback != fallback_feedback))
+
+    processed = 0
+    last_id = 0
+    while True:
+        batch = pending.filter(Essay.id > last_id).limit(batch_size).all()
+        if not batch:
+            break
+        for essay in batch:
+            essay = archive.hydrate(essay)
+            if fallback_feedback and essay.overall_feedback == fallback_feedback:
+                continue
+            CorrectionEntry.record(essay)
+        db.session.commit()
+        processed += len(batch)
+        last_id = batch[-1].id
+    return processed
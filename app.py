@@ -1,49 +1,119 @@
-from flask import Flask, request, jsonify, render_template, redirect, url_for, flash
+from flask import Flask, Blueprint, Response, request, jsonify, render_template, current_app, stream_with_context
 from flask_cors import CORS
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
-import dashscope
-from dashscope import Generation
+from werkzeug.middleware.proxy_fix import ProxyFix
 import json
-import re
+import os
 import base64
-import io
-from PIL import Image
-from datetime import datetime, date
-try:
-    import pytesseract
-    TESSERACT_AVAILABLE = True
-except ImportError:
-    TESSERACT_AVAILABLE = False
-    print("Warning: pytesseract not available. Image-to-text feature will be disabled.")
-from config import Config
-from models import db, User, Essay, Conversation, UserStats
-
-app = Flask(__name__)
-app.config.from_object(Config)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///ielts_writing.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SECRET_KEY'] = 'your-secret-key-here'  # 在生产环境中应该使用环境变量
+import weakref
+from datetime import datetime, timedelta
+from config import get_config
+from models import db, User, Essay, Conversation, UserStats, EssayDailyRollup, CorrectionEntry
+from commands import register_commands
+import llm
+import ocr
+from hedging import Deadline, DeadlineExceeded
+import responses
+import progress
+import analytics
+import search
+import export
+import identity
+import essay_cache
+import assets
+import topics
+import archive
+import task_analysis
+import admission
+from admission import admission_controlled, AdmissionRejected, too_many_requests
+from responses import PrecompressedPayload
+from reference_data import load_conjunctions, load_hot_topics
+
+bp = Blueprint('main', __name__)
 
 # 初始化扩展
-db.init_app(app)
 login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
+login_manager.login_view = 'main.login'
 login_manager.login_message = '请先登录'
 login_manager.login_message_category = 'info'
 
-CORS(app, resources={
-    r"/api/*": {
-        "origins": ["~", "http://127.0.0.1:8000", "http://localhost:3000"],
-        "methods": ["GET", "POST", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"]
-    }
-})
+cors = CORS()
+
+def create_app(config_name=None):
+    """应用工厂：按配置创建 Flask 应用，不做任何数据库或网络操作"""
+    app = Flask(__name__)
+    app.config.from_object(get_config(config_name))
+    check_required_settings(app)
+    if app.config.get('PROXY_FIX_X_FOR'):
+        # 部署在反向代理之后时按 X-Forwarded-For 取客户端 IP，匿名用户的限流才是按真实 IP 计算
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'],
+                                x_proto=app.config['PROXY_FIX_X_FOR'])
+
+    db.init_app(app)
+    login_manager.init_app(app)
+    cors.init_app(app, resources={
+        r"/api/*": {
+            "origins": ["~", "http://127.0.0.1:8000", "http://localhost:3000"],
+            "methods": ["GET", "POST", "OPTIONS"],
+            "allow_headers": ["Content-Type", "Authorization"]
+        }
+    })
+
+    responses.init_app(app)
+    llm.init_app(app)
+    task_analysis.init_app(app)
+    identity.init_app(app)
+    admission.init_app(app)
+    essay_cache.init_app(app)
+    assets.init_app(app)
+    app.register_blueprint(bp)
+    register_commands(app)
+    _apps.add(app)
+
+    if not app.config.get('DASHSCOPE_API_KEY'):
+        app.logger.warning("DASHSCOPE_API_KEY not found. Please set it in your environment or .env file")
+
+    return app
+
+def preload_heavy_modules():
+    """提前导入 OCR 和 LLM SDK，供 pre-fork 服务器在主进程中调用"""
+    llm.preload()
+    ocr.preload()
+
+def check_required_settings(app):
+    """配置类 REQUIRED_SETTINGS 中列出的配置项为空时拒绝启动"""
+    missing = [env for key, env in app.config.get('REQUIRED_SETTINGS', {}).items() if not app.config.get(key)]
+    if missing:
+        raise RuntimeError(f"Missing required environment variables: {', '.join(missing)}")
+
+# 本进程中创建过的应用；fork 钩子只注册一次，用弱引用避免让应用常驻内存
+_apps = weakref.WeakSet()
+
+def _dispose_engines_after_fork():
+    """fork 之后丢弃从父进程继承的数据库连接池，避免多个进程共享同一连接"""
+    for app in list(_apps):
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_dispose_engines_after_fork)
+
+def request_deadline():
+    """
+    本次请求的时间预算：客户端可通过 X-Request-Timeout（秒）缩短，
+    但不超过 REQUEST_TIMEOUT_MAX
+    """
+    seconds = current_app.config.get('REQUEST_TIMEOUT_DEFAULT', 90)
+    requested = request.headers.get('X-Request-Timeout', type=float)
+    if requested and requested > 0:
+        seconds = requested
+    return Deadline(min(seconds, current_app.config.get('REQUEST_TIMEOUT_MAX', 120)))
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return identity.load_snapshot(int(user_id))
 
 def update_user_stats(user_id):
     """更新用户统计信息"""
@@ -77,238 +147,17 @@ def update_user_stats(user_id):
         user_stats.updated_at = datetime.utcnow()
         
         db.session.commit()
+        identity.invalidate(user_id)
         
     except Exception as e:
         print(f"Error updating user stats: {e}")
         db.session.rollback()
 
-# Configure DashScope
-if Config.DASHSCOPE_API_KEY:
-    dashscope.api_key = Config.DASHSCOPE_API_KEY
-    print("✅ DashScope API key configured successfully")
-else:
-    print("⚠️  Warning: DASHSCOPE_API_KEY not found. Please set it in your environment or .env file")
-    print("   You can get your API key from: https://dashscope.console.aliyun.com/")
-    print("   Set it with: export DASHSCOPE_API_KEY=your_api_key_here")
-
-def generate_ielts_feedback(essay_topic, essay_text):
-    """
-    Generate comprehensive IELTS feedback using Qwen (通义千问)
-    """
-    print("Using Qwen model for essay analysis...")
-    
-    try:
-        # 构建提示词
-        prompt = f"""
-你是一位专业的雅思写作评分专家。请对以下雅思作文进行详细分析，并按照雅思官方评分标准给出反馈。
-
-题目: {essay_topic}
-
-作文内容:
-{essay_text}
-
-请按照雅思官方四项评分标准进行评分，并按照以下JSON格式返回分析结果，使用中文回复：
-
-{{
-    "overall_score": 分数(0-9),
-    "overall_feedback": "总体反馈",
-    "rubric_scores": {{
-        "task_achievement": 分数(0-9),
-        "coherence_cohesion": 分数(0-9),
-        "lexical_resource": 分数(0-9),
-        "grammatical_range_accuracy": 分数(0-9)
-    }},
-    "statistics": {{
-        "linking_words_count": 连词数量,
-        "linking_words_goal": 7,
-        "word_repetition_count": 重复词汇数量,
-        "word_repetition_goal": 3,
-        "grammar_mistakes_count": 语法错误数量,
-        "grammar_mistakes_goal": 0
-    }},
-    "task_achievement": {{
-        "score": 分数(0-9),
-        "strengths": ["优势1", "优势2"],
-        "areas_for_improvement": ["改进点1", "改进点2"],
-        "improvement_suggestions": {{
-            "how_to_address_prompt": "如何完整回应题目",
-            "how_to_develop_ideas": "如何展开观点",
-            "how_to_stay_on_topic": "如何点题",
-            "contextual_development": "上下文展开建议",
-            "better_format": "更优的格式建议",
-            "text_structure": "行文结构建议"
-        }}
-    }},
-    "coherence_cohesion": {{
-        "score": 分数(0-9),
-        "strengths": ["优势1", "优势2"],
-        "areas_for_improvement": ["改进点1", "改进点2"],
-        "improvement_suggestions": {{
-            "logical_organization": "逻辑组织建议",
-            "thematic_organization": "主题组织建议",
-            "logical_sequencing": "逻辑衔接顺序建议",
-            "referencing_substitution": "引用替换建议",
-            "discourse_markers": "标志性逻辑提示词建议"
-        }}
-    }},
-    "lexical_resource": {{
-        "score": 分数(0-9),
-        "strengths": ["优势1", "优势2"],
-        "areas_for_improvement": ["改进点1", "改进点2"],
-        "vocabulary_improvements": [
-            {{
-                "incorrect": "错误表达",
-                "correct": "正确表达",
-                "explanation": "详细解释错误原因和正确用法",
-                "error_type": "错误类型（如：介词错误、代词错误等）"
-            }}
-        ]
-    }},
-    "grammatical_range_accuracy": {{
-        "score": 分数(0-9),
-        "strengths": ["优势1", "优势2"],
-        "areas_for_improvement": ["改进点1", "改进点2"],
-        "grammar_corrections": [
-            {{
-                "incorrect": "错误语法",
-                "correct": "正确语法",
-                "explanation": "详细解释语法错误原因和正确用法",
-                "error_type": "错误类型（如：时态错误、主谓一致错误等）",
-                "sentence_context": "包含错误的完整句子"
-            }}
-        ]
-    }}
-}}
-
-评分标准说明：
-1. Task Achievement (任务完成度): 是否完全回应题目要求，观点是否清晰，论证是否充分
-2. Coherence and Cohesion (连贯与衔接): 文章结构是否清晰，段落间连接是否自然，逻辑是否连贯
-3. Lexical Resource (词汇资源): 词汇使用是否准确、多样，是否适合学术写作
-4. Grammatical Range and Accuracy (语法范围和准确性): 语法结构是否多样，语法错误是否影响理解
-
-请特别注意：
-1. 严格按照雅思官方评分标准进行评分，每项给出0-9分的具体分数
-2. 在grammar_corrections和vocabulary_improvements中，请提供具体的错误分析
-3. 在statistics中统计连词数量、重复词汇数量和语法错误数量
-4. 对于每个错误，请提供包含该错误的完整句子作为上下文
-5. 错误解释要具体，如："介词的语法错误：应使用 'From a social perspective' 而不是 'In the social point of view'"
-
-请确保返回的是有效的JSON格式，不要包含任何其他文本。
-"""
-
-        # 调用通义千问模型
-        response = Generation.call(
-            model='qwen-plus',
-            prompt=prompt,
-            max_tokens=4000,
-            temperature=0.7
-        )
-        
-        if response.status_code == 200:
-            # 尝试解析JSON响应
-            try:
-                feedback_text = response.output.text
-                # 清理响应文本，移除可能的markdown标记
-                feedback_text = feedback_text.strip()
-                if feedback_text.startswith('```json'):
-                    feedback_text = feedback_text[7:]
-                if feedback_text.endswith('```'):
-                    feedback_text = feedback_text[:-3]
-                feedback_text = feedback_text.strip()
-                
-                feedback = json.loads(feedback_text)
-                return feedback
-            except json.JSONDecodeError as e:
-                print(f"JSON解析错误: {e}")
-                print(f"原始响应: {response.output.text}")
-                # 如果JSON解析失败，返回fallback响应
-                return create_fallback_response()
-        else:
-            print(f"通义千问API调用失败: {response.status_code}")
-            return create_fallback_response()
-            
-    except Exception as e:
-        print(f"调用通义千问时发生错误: {e}")
-        return create_fallback_response()
-
-def create_fallback_response():
-    """Create a fallback response if AI generation fails"""
-    return {
-        "overall_score": 6.0,
-        "overall_feedback": "The essay addresses the topic with some relevant points, but there are areas for improvement in task response, coherence, vocabulary, and grammar.",
-        "rubric_scores": {
-            "task_achievement": 6,
-            "coherence_cohesion": 6,
-            "lexical_resource": 6,
-            "grammatical_range_accuracy": 6
-        },
-        "statistics": {
-            "linking_words_count": 3,
-            "linking_words_goal": 7,
-            "word_repetition_count": 5,
-            "word_repetition_goal": 3,
-            "grammar_mistakes_count": 2,
-            "grammar_mistakes_goal": 0
-        },
-        "task_achievement": {
-            "score": 6,
-            "strengths": ["Addresses both advantages and disadvantages", "Provides some reasoning"],
-            "areas_for_improvement": ["Needs deeper exploration", "Points could be more developed"],
-            "improvement_suggestions": {
-                "how_to_address_prompt": "Ensure you fully explore each advantage and disadvantage with detailed explanations.",
-                "how_to_develop_ideas": "Use specific examples to support your arguments.",
-                "how_to_stay_on_topic": "Always relate your points back to the main topic.",
-                "contextual_development": "Start with a clear thesis and summarize main points in conclusion.",
-                "better_format": "Use traditional essay structure: introduction, body paragraphs, conclusion.",
-                "text_structure": "Organize ideas logically within paragraphs."
-            }
-        },
-        "coherence_cohesion": {
-            "score": 6,
-            "strengths": ["Clear introduction and conclusion", "Some use of linking words"],
-            "areas_for_improvement": ["Lacks clear topic sentences", "Ideas could be better sequenced"],
-            "improvement_suggestions": {
-                "logical_organization": "Organize ideas in a structured manner with logical sequence.",
-                "thematic_organization": "Each paragraph should have a clear topic sentence.",
-                "logical_sequencing": "Ensure each paragraph flows logically from one point to the next.",
-                "referencing_substitution": "Use pronouns and referencing words effectively.",
-                "discourse_markers": "Use more varied linking words and phrases."
-            }
-        },
-        "lexical_resource": {
-            "score": 6,
-            "strengths": ["Adequate vocabulary range"],
-            "areas_for_improvement": ["Limited vocabulary variety", "Some spelling errors"],
-            "vocabulary_improvements": [
-                {
-                    "incorrect": "In the social point of view",
-                    "correct": "From a social perspective",
-                    "explanation": "介词的语法错误：应使用 'From a social perspective' 而不是 'In the social point of view'。'From a social perspective' 是更准确和自然的表达方式。",
-                    "error_type": "介词错误"
-                }
-            ]
-        },
-        "grammatical_range_accuracy": {
-            "score": 6,
-            "strengths": ["Generally clear meaning"],
-            "areas_for_improvement": ["Some grammatical errors", "Inconsistent tenses"],
-            "grammar_corrections": [
-                {
-                    "incorrect": "We are making him to try hard",
-                    "correct": "We encourage them to try hard",
-                    "explanation": "及物动词使用错误：不需要使用'making him to'，可以直接用'encourage them to'。同时代词单复数错误：应该用 'them' 而不是 'the child'，因为在之前的句子中提到了'children'。",
-                    "error_type": "及物动词错误、代词单复数错误",
-                    "sentence_context": "We are making him to try hard in his studies."
-                }
-            ]
-        }
-    }
-
-@app.route('/')
+@bp.route('/')
 def index():
     return render_template('index.html')
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         data = request.get_json()
@@ -329,7 +178,7 @@ def login():
     
     return render_template('login.html')
 
-@app.route('/register', methods=['POST'])
+@bp.route('/register', methods=['POST'])
 def register():
     data = request.get_json()
     username = data.get('username')
@@ -364,18 +213,18 @@ def register():
     
     return jsonify({'success': True, 'message': '注册成功'})
 
-@app.route('/logout')
+@bp.route('/logout')
 @login_required
 def logout():
     logout_user()
     return jsonify({'success': True, 'message': '已退出登录'})
 
-@app.route('/profile')
+@bp.route('/profile')
 @login_required
 def profile():
     return render_template('profile.html')
 
-@app.route('/test_connection.html')
+@bp.route('/test_connection.html')
 def test_connection():
     return """
     <!DOCTYPE html>
@@ -440,7 +289,18 @@ def test_connection():
     </html>
     """
 
-@app.route('/api/analyze', methods=['POST', 'OPTIONS'])
+def grading_request_in_flight():
+    """当前批改请求的作文是否已经在批改中"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return False
+    topic, essay = data.get('topic'), data.get('essay')
+    if not isinstance(topic, str) or not isinstance(essay, str):
+        return False
+    return llm.grading_in_flight(topic, essay)
+
+@bp.route('/api/analyze', methods=['POST', 'OPTIONS'])
+@admission_controlled(reserve_slot=False, joins_in_flight=grading_request_in_flight)
 def analyze_essay():
     if request.method == 'OPTIONS':
         response = jsonify({'status': 'OK'})
@@ -449,7 +309,10 @@ def analyze_essay():
         response.headers.add('Access-Control-Allow-Methods', 'POST')
         return response
     try:
-        data = request.get_json()
+        # 先校验输入：每日配额在真正调用模型时才扣除，无效请求不消耗配额
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Request body must be a JSON object'}), 400
         essay_topic = data.get('topic', '')
         essay_text = data.get('essay', '')
         
@@ -458,8 +321,10 @@ def analyze_essay():
         
         print(f"Analyzing essay: {len(essay_text)} characters")
         
-        # 直接调用，如果超时会自动使用fallback
-        feedback = generate_ielts_feedback(essay_topic, essay_text)
+        # 直接调用，如果超时会自动使用fallback；相同作文的并发请求只调用一次模型，
+        # 只有真正调用模型的请求消耗全局令牌、每日配额和 LLM 并发槽位
+        feedback, graded = llm.grade_essay(essay_topic, essay_text, guard=admission.llm_admission,
+                                   deadline=request_deadline(), guard_errors=(AdmissionRejected,))
         print("Analysis completed successfully")
         
         # 如果用户已登录，保存批改记录到数据库
@@ -493,6 +358,14 @@ def analyze_essay():
                     essay.set_vocabulary_improvements(feedback['lexical_resource']['vocabulary_improvements'])
                 
                 db.session.add(essay)
+                db.session.flush()
+                
+                # 维护每日分数汇总和纠错索引（与作文在同一事务中提交）；
+                # fallback 结果中的示例纠错不是学生的真实错误，不进入纠错索引
+                EssayDailyRollup.record(essay)
+                if graded:
+                    CorrectionEntry.record(essay)
+                search.index_essay(essay)
                 db.session.commit()
                 
                 # 更新用户统计
@@ -507,11 +380,47 @@ def analyze_essay():
         
         return jsonify(feedback)
     
+    except AdmissionRejected as e:
+        return too_many_requests(e.message, e.retry_after)
     except Exception as e:
         print(f"Error in analyze_essay: {e}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/ocr', methods=['POST', 'OPTIONS'])
+@bp.route('/api/estimate', methods=['POST'])
+def estimate_essay():
+    """本地模型给出的临时分数，在大模型批改完成前先展示"""
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Request body must be a JSON object'}), 400
+        essay_topic = data.get('topic', '')
+        essay_text = data.get('essay', '')
+        
+        if not essay_topic or not essay_text:
+            return jsonify({'error': 'Topic and essay text are required'}), 400
+        
+        # NumPy 只在第一次预估时导入，不拖慢应用启动
+        import scorer
+        model = scorer.get_scorer()
+        if model is None:
+            return jsonify({'error': 'Score estimator has not been trained yet'}), 503
+        
+        estimate = model.estimate(essay_topic, essay_text)
+        return jsonify({
+            'provisional': True,
+            'overall_score': estimate['overall_score'],
+            'rubric_scores': {
+                'task_achievement': estimate['task_achievement_score'],
+                'coherence_cohesion': estimate['coherence_cohesion_score'],
+                'lexical_resource': estimate['lexical_resource_score'],
+                'grammatical_range_accuracy': estimate['grammatical_range_accuracy_score']
+            }
+        })
+    except Exception as e:
+        print(f"Error estimating essay score: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/ocr', methods=['POST', 'OPTIONS'])
 def extract_text_from_image():
     if request.method == 'OPTIONS':
         response = jsonify({'status': 'OK'})
@@ -520,7 +429,7 @@ def extract_text_from_image():
         response.headers.add('Access-Control-Allow-Methods', 'POST')
         return response
     
-    if not TESSERACT_AVAILABLE:
+    if not ocr.is_available():
         return jsonify({'error': 'OCR feature is not available. Please install Tesseract OCR.'}), 503
     
     try:
@@ -536,15 +445,10 @@ def extract_text_from_image():
         
         # Decode base64 image
         image_bytes = base64.b64decode(image_data)
-        image = Image.open(io.BytesIO(image_bytes))
-        
-        # Convert to RGB if necessary
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
         
         # Extract text using OCR
         try:
-            text = pytesseract.image_to_string(image, lang='eng')
+            text = ocr.image_to_text(image_bytes)
         except Exception as ocr_error:
             print(f"Tesseract OCR error: {ocr_error}")
             return jsonify({'error': 'OCR processing failed. Please ensure Tesseract OCR is properly installed.'}), 500
@@ -558,62 +462,79 @@ def extract_text_from_image():
         print(f"OCR error: {e}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/conjunctions', methods=['GET'])
+def reference_payload(name, loader):
+    """静态参考数据只在第一次请求时序列化并压缩，之后直接复用"""
+    payloads = current_app.extensions.setdefault('reference_payloads', {})
+    if name not in payloads:
+        payloads[name] = PrecompressedPayload(loader())
+    return payloads[name]
+
+@bp.route('/api/conjunctions', methods=['GET'])
 def get_conjunctions():
     """Get conjunction helper data"""
     try:
-        with open('connection.json', 'r', encoding='utf-8') as f:
-            # Read the file as text and split by lines
-            content = f.read().strip()
-            # Remove the outer braces and split by comma
-            if content.startswith('{') and content.endswith('}'):
-                content = content[1:-1]
-            # Split by comma and clean up
-            lines = [line.strip().rstrip(',') for line in content.split(',')]
-            # Remove quotes around each line
-            data = [line.strip('"') for line in lines if line.strip()]
-        return jsonify(data)
+        return reference_payload('conjunctions', load_conjunctions).to_response()
     except Exception as e:
         print(f"Error loading conjunctions: {e}")
         return jsonify({'error': 'Failed to load conjunctions'}), 500
 
-@app.route('/api/hot-topics', methods=['GET'])
+@bp.route('/api/hot-topics', methods=['GET'])
 def get_hot_topics():
     """Get hot topics data"""
     try:
-        with open('hottopic.json', 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return jsonify(data)
+        return reference_payload('hot_topics', load_hot_topics).to_response()
     except Exception as e:
         print(f"Error loading hot topics: {e}")
         return jsonify({'error': 'Failed to load hot topics'}), 500
 
-@app.route('/api/random-topic', methods=['GET'])
+@bp.route('/api/random-topic', methods=['GET'])
 def get_random_topic():
-    """Get a random topic from hot topics"""
+    """Get a random topic from hot topics (不重复，直到全部题目都抽过一遍)"""
     try:
-        with open('hottopic.json', 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        owner = current_user.id if current_user.is_authenticated else None
+        topic = topics.next_random_topic(owner)
+        if topic is None:
+            return jsonify({'error': 'No topics available'}), 404
         
-        # Get random topic
-        import random
-        topic_key = random.choice(list(data.keys()))
-        topic_text = data[topic_key]
+        return jsonify(topic)
+    except Exception as e:
+        print(f"Error getting random topic: {e}")
+        return jsonify({'error': 'Failed to get random topic'}), 500
+
+@bp.route('/api/topics/search', methods=['GET'])
+def search_topics():
+    """按关键词（前缀匹配）和分类搜索题目"""
+    try:
+        query = request.args.get('q', '').strip()
+        category = request.args.get('category') or None
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+        
+        total, results = topics.get_index().search(query, category=category, limit=limit)
         
         return jsonify({
-            'topic_id': topic_key,
-            'topic_text': topic_text
+            'topics': results,
+            'total': total
         })
     except Exception as e:
-        print(f"Error getting random topic: {e}")
-        return jsonify({'error': 'Failed to get random topic'}), 500
+        print(f"Error searching topics: {e}")
+        return jsonify({'error': 'Failed to search topics'}), 500
+
+@bp.route('/api/topics/categories', methods=['GET'])
+def get_topic_categories():
+    """题目分类及每个分类下的题目数量"""
+    try:
+        return jsonify({'categories': topics.get_index().category_counts()})
+    except Exception as e:
+        print(f"Error loading topic categories: {e}")
+        return jsonify({'error': 'Failed to load topic categories'}), 500
 
-@app.route('/api/user/profile')
+@bp.route('/api/user/profile')
 @login_required
 def get_user_profile():
     """获取用户个人信息"""
     try:
-        user_stats = UserStats.query.filter_by(user_id=current_user.id).first()
+        # current_user 是带统计信息的快照，缓存命中时不需要再查询数据库
+        stats = current_user.stats
         
         profile_data = {
             'id': current_user.id,
@@ -621,12 +542,12 @@ def get_user_profile():
             'email': current_user.email,
             'created_at': current_user.created_at.isoformat(),
             'stats': {
-                'total_essays': user_stats.total_essays if user_stats else 0,
-                'average_score': round(user_stats.average_score, 1) if user_stats else 0.0,
-                'avg_task_achievement': round(user_stats.avg_task_achievement, 1) if user_stats else 0.0,
-                'avg_coherence_cohesion': round(user_stats.avg_coherence_cohesion, 1) if user_stats else 0.0,
-                'avg_lexical_resource': round(user_stats.avg_lexical_resource, 1) if user_stats else 0.0,
-                'avg_grammatical_range_accuracy': round(user_stats.avg_grammatical_range_accuracy, 1) if user_stats else 0.0
+                'total_essays': stats['total_essays'],
+                'average_score': round(stats['average_score'], 1),
+                'avg_task_achievement': round(stats['avg_task_achievement'], 1),
+                'avg_coherence_cohesion': round(stats['avg_coherence_cohesion'], 1),
+                'avg_lexical_resource': round(stats['avg_lexical_resource'], 1),
+                'avg_grammatical_range_accuracy': round(stats['avg_grammatical_range_accuracy'], 1)
             }
         }
         
@@ -635,7 +556,7 @@ def get_user_profile():
         print(f"Error getting user profile: {e}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/user/essays')
+@bp.route('/api/user/essays')
 @login_required
 def get_user_essays():
     """获取用户的批改历史"""
@@ -673,48 +594,198 @@ def get_user_essays():
         print(f"Error getting user essays: {e}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/user/essays/<int:essay_id>')
+@bp.route('/api/user/progress')
 @login_required
-def get_essay_detail(essay_id):
-    """获取特定作文的详细信息"""
+def get_user_progress():
+    """获取按周 / 按月汇总的分数进度曲线"""
     try:
-        essay = Essay.query.filter_by(id=essay_id, user_id=current_user.id).first()
+        period = request.args.get('period', 'week')
+        window = request.args.get('window', 4, type=int)
+        if period not in progress.PERIODS:
+            return jsonify({'error': f'period must be one of {", ".join(progress.PERIODS)}'}), 400
+        if window < 1:
+            return jsonify({'error': 'window must be positive'}), 400
+        
+        since = request.args.get('since')
+        until = request.args.get('until')
+        series = progress.progress_series(
+            current_user.id,
+            period=period,
+            window=window,
+            since=datetime.strptime(since, '%Y-%m-%d').date() if since else None,
+            until=datetime.strptime(until, '%Y-%m-%d').date() if until else None
+        )
         
-        if not essay:
-            return jsonify({'error': '作文不存在'}), 404
+        return jsonify({'period': period, 'window': window, 'series': series})
+    except ValueError:
+        return jsonify({'error': 'since/until must be YYYY-MM-DD'}), 400
+    except Exception as e:
+        print(f"Error getting user progress: {e}")
+        return jsonify({'error': str(e)}), 500
+
+def parse_error_type_filters():
+    """解析错误类型统计接口的公共查询参数"""
+    kind = request.args.get('kind')
+    if kind and kind not in CorrectionEntry.KINDS:
+        raise ValueError(f'kind must be one of {", ".join(CorrectionEntry.KINDS)}')
+    since = request.args.get('since')
+    until = request.args.get('until')
+    return {
+        'kind': kind,
+        'since': datetime.strptime(since, '%Y-%m-%d') if since else None,
+        # until 包含当天
+        'until': datetime.strptime(until, '%Y-%m-%d') + timedelta(days=1) if until else None,
+        'limit': min(max(request.args.get('limit', 5, type=int), 1), 50),
+    }
+
+@bp.route('/api/user/error-types')
+@login_required
+def get_user_error_types():
+    """当前用户最常见的错误类型"""
+    try:
+        filters = parse_error_type_filters()
+        return jsonify({'error_types': analytics.top_error_types(user_id=current_user.id, **filters)})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error getting user error types: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/analytics/error-types')
+@login_required
+def get_error_types():
+    """全部用户最常见的错误类型（只返回类型和次数）"""
+    try:
+        filters = parse_error_type_filters()
+        return jsonify({'error_types': analytics.top_error_types(**filters)})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error getting error types: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/user/essays/search')
+@login_required
+def search_user_essays():
+    """在当前用户的批改历史中全文搜索（题目、正文、总体反馈）"""
+    try:
+        query = request.args.get('q', '').strip()
+        limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+        cursor = request.args.get('cursor')
+        
+        if not query:
+            return jsonify({'error': 'Query is required'}), 400
+        
+        results, next_cursor = search.search_essays(current_user.id, query, limit=limit, cursor=cursor)
+        return jsonify({'results': results, 'next_cursor': next_cursor})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except search.SearchUnavailable as e:
+        return jsonify({'error': str(e)}), 501
+    except Exception as e:
+        print(f"Error searching essays: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/user/essays/export')
+@login_required
+def export_user_essays():
+    """以 CSV 或 JSONL 流式导出当前用户的全部批改记录"""
+    try:
+        fmt = request.args.get('format', 'csv')
+        if fmt not in export.FORMATS:
+            return jsonify({'error': f'format must be one of {", ".join(export.FORMATS)}'}), 400
+        
+        columns = export.parse_columns(request.args.get('columns'))
+        since = request.args.get('since')
+        until = request.args.get('until')
+        since = datetime.strptime(since, '%Y-%m-%d') if since else None
+        # until 包含当天
+        until = datetime.strptime(until, '%Y-%m-%d') + timedelta(days=1) if until else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    filename = f"essays-{current_user.id}-{datetime.utcnow().strftime('%Y%m%d')}.{fmt}"
+    stream = export.generate_export(current_user.id, fmt, columns, since=since, until=until)
+    
+    return Response(
+        stream_with_context(stream),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+def serialize_essay_detail(essay):
+    """作文详情（解析各项反馈的JSON字段）"""
+    return {
+        'id': essay.id,
+        'topic': essay.topic,
+        'content': essay.content,
+        'overall_score': essay.overall_score,
+        'rubric_scores': {
+            'task_achievement': essay.task_achievement_score,
+            'coherence_cohesion': essay.coherence_cohesion_score,
+            'lexical_resource': essay.lexical_resource_score,
+            'grammatical_range_accuracy': essay.grammatical_range_accuracy_score
+        },
+        'statistics': {
+            'linking_words_count': essay.linking_words_count,
+            'word_repetition_count': essay.word_repetition_count,
+            'grammar_mistakes_count': essay.grammar_mistakes_count
+        },
+        'overall_feedback': essay.overall_feedback,
+        'task_achievement_feedback': json.loads(essay.task_achievement_feedback) if essay.task_achievement_feedback else {},
+        'coherence_cohesion_feedback': json.loads(essay.coherence_cohesion_feedback) if essay.coherence_cohesion_feedback else {},
+        'lexical_resource_feedback': json.loads(essay.lexical_resource_feedback) if essay.lexical_resource_feedback else {},
+        'grammatical_range_accuracy_feedback': json.loads(essay.grammatical_range_accuracy_feedback) if essay.grammatical_range_accuracy_feedback else {},
+        'grammar_corrections': essay.get_grammar_corrections(),
+        'vocabulary_improvements': essay.get_vocabulary_improvements(),
+        'created_at': essay.created_at.strftime('%Y/%m/%d %H:%M:%S')
+    }
+
+@bp.route('/api/user/essays/<int:essay_id>')
+@login_required
+def get_essay_detail(essay_id):
+    """获取特定作文的详细信息（批改记录不可变，序列化结果会被缓存）"""
+    try:
+        cache = essay_cache.get_cache()
+        cached = cache.get(essay_id)
         
-        essay_data = {
-            'id': essay.id,
-            'topic': essay.topic,
-            'content': essay.content,
-            'overall_score': essay.overall_score,
-            'rubric_scores': {
-                'task_achievement': essay.task_achievement_score,
-                'coherence_cohesion': essay.coherence_cohesion_score,
-                'lexical_resource': essay.lexical_resource_score,
-                'grammatical_range_accuracy': essay.grammatical_range_accuracy_score
-            },
-            'statistics': {
-                'linking_words_count': essay.linking_words_count,
-                'word_repetition_count': essay.word_repetition_count,
-                'grammar_mistakes_count': essay.grammar_mistakes_count
-            },
-            'overall_feedback': essay.overall_feedback,
-            'task_achievement_feedback': json.loads(essay.task_achievement_feedback) if essay.task_achievement_feedback else {},
-            'coherence_cohesion_feedback': json.loads(essay.coherence_cohesion_feedback) if essay.coherence_cohesion_feedback else {},
-            'lexical_resource_feedback': json.loads(essay.lexical_resource_feedback) if essay.lexical_resource_feedback else {},
-            'grammatical_range_accuracy_feedback': json.loads(essay.grammatical_range_accuracy_feedback) if essay.grammatical_range_accuracy_feedback else {},
-            'grammar_corrections': essay.get_grammar_corrections(),
-            'vocabulary_improvements': essay.get_vocabulary_improvements(),
-            'created_at': essay.created_at.strftime('%Y/%m/%d %H:%M:%S')
-        }
+        if cached is None:
+            essay = Essay.query.filter_by(id=essay_id, user_id=current_user.id).first()
+            
+            if not essay:
+                return jsonify({'error': '作文不存在'}), 404
+            
+            payload = PrecompressedPayload(
+                serialize_essay_detail(archive.hydrate(essay)),
+                gzip_level=6,
+                br_quality=4,
+                cache_control=essay_cache.IMMUTABLE_CACHE_CONTROL
+            )
+            cache.put(essay_id, essay.user_id, payload)
+        else:
+            owner_id, payload = cached
+            # 缓存命中时同样只允许作者本人查看
+            if owner_id != current_user.id:
+                return jsonify({'error': '作文不存在'}), 404
         
-        return jsonify(essay_data)
+        return payload.to_response()
     except Exception as e:
         print(f"Error getting essay detail: {e}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/chat', methods=['POST', 'OPTIONS'])
+@bp.route('/api/metrics')
+@login_required
+def get_metrics():
+    """进程内的 LLM 调用计数器；默认关闭，METRICS_ENABLED 打开后登录用户可见"""
+    if not current_app.config.get('METRICS_ENABLED', False):
+        return jsonify({'error': 'Not found'}), 404
+    metrics = llm.metrics()
+    metrics['essay_detail_cache'] = essay_cache.get_cache().stats()
+    return jsonify(metrics)
+
+@bp.route('/api/chat', methods=['POST', 'OPTIONS'])
+@admission_controlled(counts_toward_quota=False)
 def chat_with_student():
     if request.method == 'OPTIONS':
         response = jsonify({'status': 'OK'})
@@ -750,18 +821,15 @@ def chat_with_student():
         """
         
         try:
-            response = Generation.call(
-                model='qwen-plus',
-                prompt=prompt,
-                max_tokens=1000,
-                temperature=0.7
-            )
+            reply = llm.chat_reply(prompt, question, deadline=request_deadline())
             
-            if response.status_code == 200:
-                return jsonify({'response': response.output.text})
+            if reply is not None:
+                return jsonify({'response': reply})
             else:
                 return jsonify({'error': '通义千问API调用失败'}), 500
                 
+        except DeadlineExceeded:
+            return jsonify({'error': '通义千问响应超时，请稍后再试'}), 504
         except Exception as e:
             print(f"Chat error with Qwen: {e}")
             return jsonify({'error': str(e)}), 500
@@ -770,10 +838,10 @@ def chat_with_student():
         print(f"Chat error: {e}")
         return jsonify({'error': str(e)}), 500
 
-# 创建数据库表
-with app.app_context():
-    db.create_all()
-    print("Database tables created successfully")
-
 if __name__ == '__main__':
+    app = create_app()
+    # 本地开发时顺便建表；部署环境请显式执行 `flask --app app init-db`
+    with app.app_context():
+        db.create_all()
+        search.ensure_search_index()
     app.run(debug=True, port=8000)
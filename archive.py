@@ -0,0 +1,149 @@
+"""
+作文冷热分层
+
+批改记录中体积最大的是正文和各项反馈 JSON，而它们只在查看详情、导出时才用到。
+超过 ARCHIVE_AFTER_DAYS 天的作文：
+- 正文、完整题目和全部反馈压缩后写入 EssayArchive（archive 绑定，可以是单独的 SQLite 文件）
+- Essay 表中只保留瘦身后的摘要行：分数、统计、题目前缀、时间戳；正文置为空字符串
+  （正常保存的作文正文不可能为空，空正文即表示已归档）
+历史列表、进度、统计等只用摘要列的查询不受影响，而且热表小得多，更容易留在页缓存里。
+需要完整内容的地方（详情、导出、训练）通过 hydrate / load_payloads 从冷存储读回，
+读回的数据不会写回热表。全文搜索表 essay_fts 中的副本同时换成摘要行，只能按题目前缀搜到。
+
+归档：flask --app app archive-essays [--older-than-days N] [--vacuum]
+"""
+
+import json
+import zlib
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from flask import current_app
+from sqlalchemy import text
+
+from models import db, Essay, EssayArchive
+import search
+
+# 移入冷存储的列
+ARCHIVED_FIELDS = (
+    'topic',
+    'content',
+    'overall_feedback',
+    'task_achievement_feedback',
+    'coherence_cohesion_feedback',
+    'lexical_resource_feedback',
+    'grammatical_range_accuracy_feedback',
+    'grammar_corrections',
+    'vocabulary_improvements',
+)
+
+ARCHIVED_CONTENT = ''
+
+def is_archived(essay):
+    return essay.content == ARCHIVED_CONTENT
+
+def pack(essay):
+    raw = json.dumps({name: getattr(essay, name) for name in ARCHIVED_FIELDS}, ensure_ascii=False)
+    return zlib.compress(raw.encode('utf-8'), 9)
+
+def unpack(payload):
+    return json.loads(zlib.decompress(payload).decode('utf-8'))
+
+def load_payloads(essay_ids):
+    """{essay_id: 冷数据 dict}，不在冷存储中的 id 不出现在结果里"""
+    if not essay_ids:
+        return {}
+    rows = db.session.execute(
+        db.select(EssayArchive.essay_id, EssayArchive.payload).where(EssayArchive.essay_id.in_(essay_ids))
+    ).all()
+    return {row.essay_id: unpack(row.payload) for row in rows}
+
+def hydrate(essay):
+    """
+    返回包含完整内容的作文：未归档时就是 essay 本身，
+    已归档时是从冷存储还原的临时 Essay 对象（不加入 session，不会写回热表）
+    """
+    if not is_archived(essay):
+        return essay
+    payload = load_payloads([essay.id]).get(essay.id)
+    if payload is None:
+        print(f"Archived essay {essay.id} is missing from cold storage")
+        return essay
+    columns = {c.name: getattr(essay, c.name) for c in Essay.__table__.columns}
+    columns.update(payload)
+    return Essay(**columns)
+
+def hydrate_rows(rows):
+    """
+    Core 行版本的 hydrate：已归档的行替换为带完整内容的对象（属性访问方式不变），
+    同一批行的冷数据用一次查询读回
+    """
+    archived = [row.id for row in rows if getattr(row, 'content', None) == ARCHIVED_CONTENT]
+    if not archived:
+        return rows
+    payloads = load_payloads(archived)
+    hydrated = []
+    for row in rows:
+        payload = payloads.get(row.id)
+        if payload is None:
+            hydrated.append(row)
+            continue
+        values = row._asdict()
+        values.update((k, v) for k, v in payload.items() if k in values)
+        hydrated.append(SimpleNamespace(**values))
+    return hydrated
+
+def archive_essays(older_than_days=None, batch_size=500):
+    """
+    把早于指定天数的作文移入冷存储，返回归档的篇数。
+    每批先提交冷数据再瘦身热表，中途失败重新执行即可
+    """
+    if older_than_days is None:
+        older_than_days = current_app.config.get('ARCHIVE_AFTER_DAYS', 365)
+    prefix = current_app.config.get('ARCHIVE_TOPIC_PREFIX', 120)
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+
+    archived = 0
+    last_id = 0
+    while True:
+        batch = Essay.query.filter(
+            Essay.id > last_id,
+            Essay.created_at < cutoff,
+            Essay.content != ARCHIVED_CONTENT
+        ).order_by(Essay.id).limit(batch_size).all()
+        if not batch:
+            break
+
+        ids = [essay.id for essay in batch]
+        now = datetime.utcnow()
+        for essay in batch:
+            db.session.merge(EssayArchive(essay_id=essay.id, user_id=essay.user_id,
+                                          payload=pack(essay), archived_at=now))
+        db.session.commit()
+
+        for essay in db.session.execute(db.select(Essay).where(Essay.id.in_(ids))).scalars():
+            essay.topic = essay.topic[:prefix]
+            essay.content = ARCHIVED_CONTENT
+            for name in ARCHIVED_FIELDS[2:]:
+                setattr(essay, name, None)
+            # essay_fts 也在热库中，保存着正文和反馈的完整副本
+            search.index_essay(essay)
+        db.session.commit()
+
+        archived += len(ids)
+        last_id = ids[-1]
+    return archived
+
+def vacuum():
+    """SQLite 中删除的数据不会自动归还磁盘空间，归档后合并搜索索引并执行 VACUUM 压实热表"""
+    search.optimize_search_index()
+    for engine in db.engines.values():
+        if engine.dialect.name == 'sqlite':
+            with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                conn.execute(text('VACUUM'))
+
+def stats():
+    """热表中已归档 / 未归档的篇数"""
+    archived = db.session.query(db.func.count(Essay.id)).filter(Essay.content == ARCHIVED_CONTENT).scalar()
+    total = db.session.query(db.func.count(Essay.id)).scalar()
+    return {'hot': total - archived, 'archived': archived}
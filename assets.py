@@ -0,0 +1,214 @@
+"""
+静态资源构建与带指纹的 URL
+
+构建：flask --app app build-assets
+  - 压缩（去注释、去缩进）static 下的 JS/CSS
+  - 按内容哈希重命名输出到 static/dist，例如 js/app.3f2a9c1e.js
+  - 同时生成 .gz / .br 预压缩文件和 manifest.json
+
+模板里用 asset_url('js/app.js')：有 manifest 时返回带哈希的 /assets/... 地址，
+该地址的内容永不改变，可以设置一年的 immutable 缓存；
+没有构建过（或开发模式）时回退到普通的 url_for('static', ...)。
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+
+from flask import current_app, url_for, send_from_directory, request, abort
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ASSET_SOURCES = ('css/style.css', 'js/app.js', 'js/profile.js')
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+MANIFEST_NAME = 'manifest.json'
+
+# ---------------------------------------------------------------- 压缩
+
+# 出现在这些字符之后的 / 是正则字面量的开头，而不是除号
+_REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^')
+
+def minify_js(source):
+    """
+    保守的 JS 压缩：去掉注释和每行首尾空白、空行。
+    保留换行（不依赖自动分号插入的细节），字符串、模板字符串、正则字面量原样保留
+    """
+    out = []
+    i, n = 0, len(source)
+    last_code = ''
+    while i < n:
+        c = source[i]
+        nxt = source[i + 1] if i + 1 < n else ''
+        if c == '/' and nxt == '/':
+            while i < n and source[i] != '\n':
+                i += 1
+            continue
+        if c == '/' and nxt == '*':
+            end = source.find('*/', i + 2)
+            i = n if end < 0 else end + 2
+            out.append(' ')
+            continue
+        if c in '"\'`' or (c == '/' and (not last_code or last_code in _REGEX_PRECEDERS)):
+            j = _skip_literal(source, i)
+            out.append(source[i:j])
+            last_code = source[j - 1]
+            i = j
+            continue
+        out.append(c)
+        if not c.isspace():
+            last_code = c
+        i += 1
+
+    lines = (line.strip() for line in ''.join(out).split('\n'))
+    return '\n'.join(line for line in lines if line) + '\n'
+
+def _skip_literal(source, start):
+    """返回从 start 开始的字符串/模板/正则字面量之后的位置"""
+    quote = source[start]
+    i, n = start + 1, len(source)
+    in_class = False
+    while i < n:
+        c = source[i]
+        if c == '\\':
+            i += 2
+            continue
+        if quote == '/':
+            if c == '[':
+                in_class = True
+            elif c == ']':
+                in_class = False
+            elif c == '/' and not in_class:
+                i += 1
+                while i < n and source[i].isalpha():
+                    i += 1
+                return i
+        elif c == quote:
+            return i + 1
+        i += 1
+    return n
+
+_CSS_COMMENT_RE = re.compile(r'/\*.*?\*/', re.S)
+_CSS_STRING_RE = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'')
+
+def minify_css(source):
+    """去掉注释，合并空白，去掉 { } ; , > 和冒号之后多余的空格"""
+    strings = []
+
+    def keep(match):
+        strings.append(match.group(0))
+        return f'\0{len(strings) - 1}\0'
+
+    css = _CSS_STRING_RE.sub(keep, source)
+    css = _CSS_COMMENT_RE.sub('', css)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    # 选择器里冒号前的空格有意义（"div :hover"），只去掉冒号后的
+    css = re.sub(r':\s+', ':', css)
+    css = css.replace(';}', '}').strip()
+    return re.sub(r'\0(\d+)\0', lambda m: strings[int(m.group(1))], css) + '\n'
+
+MINIFIERS = {
+    '.js': minify_js,
+    '.css': minify_css,
+}
+
+# ---------------------------------------------------------------- 构建
+
+def output_dir(app):
+    return app.config.get('ASSET_OUTPUT_DIR') or os.path.join(app.static_folder, 'dist')
+
+def fingerprint(path, body):
+    """js/app.js -> js/app.<哈希前 8 位>.js"""
+    root, ext = os.path.splitext(path)
+    return f'{root}.{hashlib.sha256(body).hexdigest()[:8]}{ext}'
+
+def build(app, sources=ASSET_SOURCES):
+    """构建所有资源并写入 manifest，返回 {源路径: 带哈希路径}"""
+    out_dir = output_dir(app)
+    manifest = {}
+    for path in sources:
+        with open(os.path.join(app.static_folder, path), encoding='utf-8') as f:
+            text = f.read()
+        minify = MINIFIERS.get(os.path.splitext(path)[1])
+        body = (minify(text) if minify else text).encode('utf-8')
+
+        hashed = fingerprint(path, body)
+        target = os.path.join(out_dir, hashed)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        _write(target, body)
+        _write(target + '.gz', gzip.compress(body, compresslevel=9, mtime=0))
+        if brotli is not None:
+            _write(target + '.br', brotli.compress(body, quality=11))
+        manifest[path] = hashed
+
+    _write(os.path.join(out_dir, MANIFEST_NAME),
+           json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return manifest
+
+def _write(path, body):
+    # 先写临时文件再替换，运行中的进程不会读到写了一半的文件
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(body)
+    os.replace(tmp, path)
+
+# ---------------------------------------------------------------- 运行时
+
+def load_manifest(app):
+    try:
+        with open(os.path.join(output_dir(app), MANIFEST_NAME), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def asset_url(filename):
+    """模板辅助函数：优先返回带指纹的地址"""
+    hashed = current_app.extensions.get('asset_manifest', {}).get(filename)
+    if hashed is None:
+        return url_for('static', filename=filename)
+    return url_for('serve_asset', filename=hashed)
+
+def serve_asset(filename):
+    """
+    带指纹的资源：按 Accept-Encoding 返回预压缩文件，缓存一年。
+    只提供 manifest 里登记过的文件
+    """
+    manifest = current_app.extensions.get('asset_manifest', {})
+    if filename not in manifest.values():
+        abort(404)
+
+    out_dir = output_dir(current_app)
+    encodings = ['br', 'gzip'] if brotli is not None else ['gzip']
+    encoding = request.accept_encodings.best_match(encodings)
+    suffix = {'br': '.br', 'gzip': '.gz'}.get(encoding)
+    if suffix and not os.path.exists(os.path.join(out_dir, filename + suffix)):
+        encoding = suffix = None
+
+    response = send_from_directory(out_dir, filename + (suffix or ''),
+                                   mimetype=_mimetype(filename), etag=False, conditional=False)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    response.set_etag(os.path.basename(filename) + ('-' + encoding if encoding else ''))
+    return response.make_conditional(request)
+
+def _mimetype(filename):
+    return {
+        '.js': 'text/javascript',
+        '.css': 'text/css',
+    }.get(os.path.splitext(filename)[1])
+
+def init_app(app):
+    # 开发模式下直接使用源文件，修改后刷新即可生效
+    manifest = {} if app.debug else load_manifest(app)
+    app.extensions['asset_manifest'] = manifest
+    app.add_url_rule('/assets/<path:filename>', 'serve_asset', serve_asset)
+    app.jinja_env.globals['asset_url'] = asset_url
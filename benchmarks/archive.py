@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+冷热分层基准：在临时 SQLite 文件中生成大量作文（含 init-db 创建的 essay_fts 全文索引），对比归档前后
+  1. 热库文件大小 / 页数（其中 essay_fts 占用的页数），以及 2MB 页缓存能覆盖热库的比例
+  2. 历史列表查询（按用户取最近 10 篇）和全表统计扫描的耗时
+  3. 详情读取：热数据 vs 从冷存储读回
+
+用法: python benchmarks/archive.py [作文篇数]
+"""
+
+import copy
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+import archive
+import search
+from models import db, User, Essay
+from llm import create_fallback_response
+
+USERS = 200
+OLD_RATIO = 0.8
+CACHE_KIB = 2048
+
+def make_essay(user_id, created_at):
+    feedback = create_fallback_response()
+    grammar = feedback['grammatical_range_accuracy']['grammar_corrections'][0]
+    vocab = feedback['lexical_resource']['vocabulary_improvements'][0]
+    essay = Essay(
+        user_id=user_id,
+        topic=random.choice(['Some people think that ', 'Many believe that ']) + 'x' * 180,
+        content=' '.join(random.choice(['education', 'government', 'children', 'technology', 'however'])
+                         for _ in range(300)),
+        overall_score=random.choice([5.5, 6.0, 6.5, 7.0]),
+        task_achievement_score=6, coherence_cohesion_score=6,
+        lexical_resource_score=6, grammatical_range_accuracy_score=6,
+        overall_feedback=feedback['overall_feedback'] * 3,
+        task_achievement_feedback=json.dumps(feedback['task_achievement'], ensure_ascii=False),
+        coherence_cohesion_feedback=json.dumps(feedback['coherence_cohesion'], ensure_ascii=False),
+        lexical_resource_feedback=json.dumps(feedback['lexical_resource'], ensure_ascii=False),
+        grammatical_range_accuracy_feedback=json.dumps(feedback['grammatical_range_accuracy'], ensure_ascii=False),
+        created_at=created_at,
+    )
+    essay.set_grammar_corrections([copy.deepcopy(grammar) for _ in range(8)])
+    essay.set_vocabulary_improvements([copy.deepcopy(vocab) for _ in range(8)])
+    return essay
+
+def populate(count):
+    users = [User(username=f'user{i}', email=f'user{i}@example.com', password_hash='x') for i in range(USERS)]
+    db.session.add_all(users)
+    db.session.commit()
+    now = datetime.utcnow()
+    for i in range(count):
+        days = random.randint(400, 1500) if random.random() < OLD_RATIO else random.randint(0, 300)
+        db.session.add(make_essay(users[i % USERS].id, now - timedelta(days=days)))
+        if i % 1000 == 999:
+            db.session.commit()
+    db.session.commit()
+
+def measure(path):
+    conn = sqlite3.connect(path)
+    conn.execute(f'PRAGMA cache_size=-{CACHE_KIB}')
+    page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+    pages = conn.execute('PRAGMA page_count').fetchone()[0]
+    try:
+        fts_pages = conn.execute("SELECT SUM(pageno) FROM (SELECT COUNT(*) AS pageno FROM dbstat "
+                                 "WHERE name LIKE 'essay_fts%')").fetchone()[0] or 0
+    except sqlite3.OperationalError:
+        fts_pages = None    # 没有编译 dbstat 虚拟表
+
+    started = time.perf_counter()
+    for _ in range(200):
+        conn.execute(
+            'SELECT id, topic, overall_score, created_at FROM essay '
+            'WHERE user_id = ? ORDER BY created_at DESC LIMIT 10', (random.randint(1, USERS),)
+        ).fetchall()
+    history_ms = (time.perf_counter() - started) / 200 * 1000
+
+    started = time.perf_counter()
+    for _ in range(5):
+        conn.execute('SELECT user_id, AVG(overall_score), COUNT(*) FROM essay GROUP BY user_id').fetchall()
+    scan_ms = (time.perf_counter() - started) / 5 * 1000
+    conn.close()
+
+    return {
+        'size_mib': pages * page_size / 2 ** 20,
+        'fts_mib': None if fts_pages is None else fts_pages * page_size / 2 ** 20,
+        'cache_coverage': min(1.0, CACHE_KIB * 1024 / (pages * page_size)),
+        'history_ms': history_ms,
+        'scan_ms': scan_ms,
+    }
+
+def detail_latency(essay_ids):
+    started = time.perf_counter()
+    for essay_id in essay_ids:
+        essay = archive.hydrate(db.session.get(Essay, essay_id))
+        essay.get_grammar_corrections()
+        db.session.expunge_all()
+    return (time.perf_counter() - started) / len(essay_ids) * 1000
+
+def report(label, stats):
+    fts = '' if stats['fts_mib'] is None else f"（全文索引 {stats['fts_mib']:.1f} MiB）"
+    print(f"  {label:<6} 热库 {stats['size_mib']:7.1f} MiB{fts}  页缓存覆盖 {stats['cache_coverage']:6.1%}  "
+          f"历史列表 {stats['history_ms']:7.2f} ms  统计扫描 {stats['scan_ms']:8.1f} ms")
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    random.seed(1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        hot_path = os.path.join(tmp, 'hot.db')
+        app = Flask(__name__)
+        app.config.update(
+            SQLALCHEMY_DATABASE_URI=f'sqlite:///{hot_path}',
+            SQLALCHEMY_BINDS={'archive': f"sqlite:///{os.path.join(tmp, 'cold.db')}"},
+            ARCHIVE_AFTER_DAYS=365,
+        )
+        db.init_app(app)
+
+        with app.app_context():
+            db.create_all()
+            print(f"🧊 冷热分层基准（{count} 篇作文，{OLD_RATIO:.0%} 超过一年，页缓存 {CACHE_KIB // 1024} MiB）")
+            started = time.perf_counter()
+            populate(count)
+            search.rebuild_search_index()
+            print(f"  生成数据 {time.perf_counter() - started:.1f}s")
+
+            before = measure(hot_path)
+            report('归档前', before)
+
+            sample = [row.id for row in db.session.execute(
+                db.select(Essay.id).where(Essay.created_at < datetime.utcnow() - timedelta(days=365)).limit(200))]
+            hot_detail = detail_latency(sample)
+
+            started = time.perf_counter()
+            archived = archive.archive_essays()
+            archive.vacuum()
+            print(f"  归档 {archived} 篇并 VACUUM：{time.perf_counter() - started:.1f}s，"
+                  f"冷库 {os.path.getsize(os.path.join(tmp, 'cold.db')) / 2 ** 20:.1f} MiB")
+
+            after = measure(hot_path)
+            report('归档后', after)
+            cold_detail = detail_latency(sample)
+
+            print(f"  历史列表加速 {before['history_ms'] / after['history_ms']:.1f}x，"
+                  f"统计扫描加速 {before['scan_ms'] / after['scan_ms']:.1f}x")
+            print(f"  详情读取：热数据 {hot_detail:.2f} ms，从冷存储读回 {cold_detail:.2f} ms")
+            db.session.remove()
+            for engine in db.engines.values():
+                engine.dispose()
+
+if __name__ == '__main__':
+    main()
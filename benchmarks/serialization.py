@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+序列化与传输体积基准：对比标准库 jsonify 默认行为（ensure_ascii=True）
+与 responses.FastJSONProvider 在典型批改反馈上的耗时，以及 gzip/brotli 后的字节数。
+
+用法: python benchmarks/serialization.py [重复次数]
+"""
+
+import copy
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import responses
+from llm import create_fallback_response
+
+def typical_feedback(corrections=12):
+    """在 fallback 反馈的基础上扩充纠错列表，得到几十 KB 的典型反馈文档"""
+    feedback = create_fallback_response()
+    grammar = feedback['grammatical_range_accuracy']['grammar_corrections'][0]
+    vocab = feedback['lexical_resource']['vocabulary_improvements'][0]
+    feedback['grammatical_range_accuracy']['grammar_corrections'] = [
+        copy.deepcopy(grammar) for _ in range(corrections)
+    ]
+    feedback['lexical_resource']['vocabulary_improvements'] = [
+        copy.deepcopy(vocab) for _ in range(corrections)
+    ]
+    return feedback
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    doc = typical_feedback()
+
+    candidates = {
+        'stdlib (ensure_ascii=True)': lambda: json.dumps(doc).encode('utf-8'),
+        'stdlib (ensure_ascii=False)': lambda: json.dumps(doc, ensure_ascii=False).encode('utf-8'),
+        f"fast provider ({'orjson' if responses.orjson else 'stdlib'})": lambda: responses.dumps_bytes(doc),
+    }
+
+    print(f"📦 序列化耗时（{number} 次平均）与传输字节数")
+    for name, fn in candidates.items():
+        seconds = timeit.timeit(fn, number=number) / number
+        body = fn()
+        sizes = [f"raw={len(body)}"]
+        for encoding in responses.supported_encodings():
+            sizes.append(f"{encoding}={len(responses.compress(body, encoding))}")
+        print(f"  {name:<32} {seconds * 1e6:8.1f} µs  {' '.join(sizes)}")
+
+if __name__ == '__main__':
+    main()
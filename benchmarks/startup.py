@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+启动耗时基准：在全新的解释器中分别测量
+  1. import app 的耗时
+  2. create_app() 的耗时
+  3. 第一个请求的延迟（首页和 /api/hot-topics）
+  4. 首次导入 DashScope / OCR 依赖的耗时（即被推迟到第一次使用的部分）
+
+用法: python benchmarks/startup.py [运行次数]
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r'''
+import json, time
+t0 = time.perf_counter()
+import app as app_module
+t1 = time.perf_counter()
+app = app_module.create_app('testing')
+t2 = time.perf_counter()
+client = app.test_client()
+client.get('/')
+t3 = time.perf_counter()
+client.get('/api/hot-topics')
+t4 = time.perf_counter()
+try:
+    app_module.preload_heavy_modules()
+    lazy = time.perf_counter() - t4
+except ImportError:
+    lazy = None
+print(json.dumps({
+    'import_app': t1 - t0,
+    'create_app': t2 - t1,
+    'first_request_index': t3 - t2,
+    'first_request_hot_topics': t4 - t3,
+    'lazy_heavy_imports': lazy,
+}))
+'''
+
+def run_once():
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    samples = [run_once() for _ in range(runs)]
+
+    print(f"⏱️  启动耗时（{runs} 次运行的中位数）")
+    for key in samples[0]:
+        values = [s[key] for s in samples if s[key] is not None]
+        if not values:
+            print(f"  {key:<28} n/a (依赖未安装)")
+            continue
+        print(f"  {key:<28} {statistics.median(values) * 1000:8.1f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+相同请求合并（single-flight）
+
+同一个 key 同时只执行一次：第一个到达的请求（leader）真正执行函数，
+执行期间到达的相同请求（follower）等待并共享它的结果或异常。
+执行结束后 key 立即移除，不做结果缓存。
+"""
+
+import copy
+import threading
+import time
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key, fn, timeout=None, unshared=()):
+        """
+        执行 fn 或加入正在执行的相同调用，返回 (结果, 是否为合并请求)。
+        follower 最多等待 timeout 秒，超时抛出 TimeoutError。
+        leader 抛出 unshared 中的异常（例如它自己的准入被拒绝）时不传给 follower，
+        follower 重新执行或加入新的调用
+        """
+        expires_at = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                if call is not None:
+                    call.waiters += 1
+                    self.coalesced += 1
+                    leader = False
+                else:
+                    call = _Call()
+                    self._calls[key] = call
+                    self.executed += 1
+                    leader = True
+
+            if leader:
+                break
+            remaining = None if expires_at is None else max(0.0, expires_at - time.monotonic())
+            if not call.done.wait(remaining):
+                raise TimeoutError('timed out waiting for in-flight call')
+            if call.error is None:
+                # 每个请求拿到独立的副本，避免调用方修改共享结果
+                return copy.deepcopy(call.result), True
+            if not isinstance(call.error, unshared):
+                raise call.error
+
+        try:
+            call.result = fn()
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def is_in_flight(self, key):
+        with self._lock:
+            return key in self._calls
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'executed': self.executed,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._calls),
+            }
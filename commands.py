@@ -0,0 +1,116 @@
+"""
+Flask 命令行命令（flask --app app <command>）
+"""
+
+import os
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from models import db
+import progress
+import analytics
+import search
+import assets
+import archive
+import task_analysis
+from reference_data import load_hot_topics
+from llm import create_fallback_response
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """创建所有数据库表"""
+    db.create_all()
+    search.ensure_search_index()
+    click.echo("Database tables created successfully")
+
+@click.command('rebuild-progress')
+@with_appcontext
+@click.option('--user-id', type=int, default=None, help='只重建指定用户')
+def rebuild_progress_command(user_id):
+    """根据历史作文重建每日分数汇总"""
+    processed = progress.rebuild_rollups(user_id)
+    click.echo(f"Rebuilt daily rollups from {processed} essays")
+
+@click.command('backfill-corrections')
+@with_appcontext
+@click.option('--batch-size', type=int, default=500, show_default=True)
+def backfill_corrections_command(batch_size):
+    """为历史作文补建纠错索引"""
+    processed = analytics.backfill_correction_index(
+        batch_size, fallback_feedback=create_fallback_response()['overall_feedback'])
+    click.echo(f"Indexed corrections for {processed} essays")
+
+@click.command('rebuild-search-index')
+@with_appcontext
+def rebuild_search_index_command():
+    """重建作文全文搜索索引"""
+    indexed = search.rebuild_search_index()
+    click.echo(f"Indexed {indexed} essays for search")
+
+@click.command('train-scorer')
+@with_appcontext
+@click.option('--alpha', type=float, default=1.0, show_default=True, help='岭回归正则化系数')
+@click.option('--holdout', type=float, default=0.2, show_default=True, help='用于评估的留出比例')
+@click.option('--min-essays', type=int, default=50, show_default=True)
+def train_scorer_command(alpha, holdout, min_essays):
+    """用历史批改记录训练本地分数预估模型，并输出准确率和耗时报告"""
+    import scorer
+
+    pairs, scores = scorer.training_data(create_fallback_response()['overall_feedback'])
+    if len(pairs) < min_essays:
+        raise click.ClickException(f"Only {len(pairs)} graded essays available, need at least {min_essays}")
+
+    model, report = scorer.train(pairs, scores, alpha=alpha, holdout=holdout)
+    path = scorer.model_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    model.save(path)
+
+    click.echo(f"Trained on {len(pairs)} essays, saved to {path}")
+    if report:
+        click.echo(f"Holdout ({report['essays']} essays), average latency {report['latency_ms']} ms:")
+        for target in scorer.TARGETS:
+            click.echo(f"  {target:<34} MAE {report['mae'][target]:.2f}  "
+                       f"within 0.5 band {report['within_half_band'][target]:.0%}")
+
+@click.command('build-assets')
+@with_appcontext
+def build_assets_command():
+    """压缩静态资源，生成带内容哈希的文件、预压缩文件和 manifest"""
+    manifest = assets.build(current_app)
+    for source, hashed in manifest.items():
+        click.echo(f"{source} -> {hashed}")
+    click.echo("Restart the app to serve the new assets")
+
+@click.command('archive-essays')
+@with_appcontext
+@click.option('--older-than-days', type=int, default=None, help='默认使用 ARCHIVE_AFTER_DAYS 配置')
+@click.option('--batch-size', type=int, default=500, show_default=True)
+@click.option('--vacuum', is_flag=True, help='归档后对 SQLite 执行 VACUUM 回收空间')
+def archive_essays_command(older_than_days, batch_size, vacuum):
+    """把旧作文的正文和反馈移入压缩的冷存储"""
+    archived = archive.archive_essays(older_than_days, batch_size)
+    counts = archive.stats()
+    click.echo(f"Archived {archived} essays ({counts['hot']} hot, {counts['archived']} archived in total)")
+    if vacuum:
+        archive.vacuum()
+        click.echo("Vacuumed SQLite databases")
+
+@click.command('warm-topic-analysis')
+@with_appcontext
+def warm_topic_analysis_command():
+    """为全部热门题目预先生成任务分析"""
+    written = task_analysis.cache.warm(load_hot_topics())
+    click.echo(f"Wrote task analysis for {written} topics to {task_analysis.cache.path}")
+
+def register_commands(app):
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(rebuild_progress_command)
+    app.cli.add_command(backfill_corrections_command)
+    app.cli.add_command(rebuild_search_index_command)
+    app.cli.add_command(train_scorer_command)
+    app.cli.add_command(build_assets_command)
+    app.cli.add_command(archive_essays_command)
+    app.cli.add_command(warm_topic_analysis_command)
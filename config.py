@@ -6,4 +6,120 @@ load_dotenv()
 class Config:
     DASHSCOPE_API_KEY = os.environ.get('DASHSCOPE_API_KEY')
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key'
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///ielts_writing.db'
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # 归档作文的冷数据；默认与主库相同，设置 ARCHIVE_DATABASE_URL 可以放到单独的 SQLite 文件
+    SQLALCHEMY_BINDS = {
+        'archive': os.environ.get('ARCHIVE_DATABASE_URL') or SQLALCHEMY_DATABASE_URI,
+    }
+    DEBUG = False
+
+    # 在 pre-fork 服务器（如 gunicorn --preload）的主进程中预先导入 OCR / LLM 依赖，
+    # 让各 worker 通过写时复制共享这些模块
+    PRELOAD_HEAVY_MODULES = False
+
+    # 大于该字节数的 JSON/文本响应才压缩；COMPRESS_LEVEL 为 None 时使用默认压缩级别
+    COMPRESS_MIN_SIZE = 1024
+    COMPRESS_LEVEL = None
+
+    # 进程内用户身份缓存（条目数上限 / 过期秒数）
+    IDENTITY_CACHE_SIZE = 1024
+    IDENTITY_CACHE_TTL = 300
+
+    # 作文详情缓存（条目数 / 总字节数上限）
+    ESSAY_DETAIL_CACHE_SIZE = 512
+    ESSAY_DETAIL_CACHE_BYTES = 32 * 1024 * 1024
+
+    # LLM 接口准入控制：rate 为每秒补充的请求数，burst 为突发上限，
+    # daily_quota 为每日批改次数（None 表示不限），slot_share 为最多可占用的并发槽位比例
+    ADMISSION_ENABLED = True
+    ADMISSION_LANES = {
+        'priority': {'rate': 1.0, 'burst': 30, 'daily_quota': None, 'slot_share': 1.0},
+        'user': {'rate': 0.1, 'burst': 5, 'daily_quota': 50, 'slot_share': 0.75},
+        'anonymous': {'rate': 0.02, 'burst': 3, 'daily_quota': None, 'slot_share': 0.5},
+    }
+    # 优先通道的用户名（如教师账号），逗号分隔
+    ADMISSION_PRIORITY_USERS = {u.strip() for u in os.environ.get('PRIORITY_USERS', '').split(',') if u.strip()}
+    # 前面有几层反向代理（nginx 等）；大于 0 时用 ProxyFix 从 X-Forwarded-For 取客户端 IP。
+    # 没有代理时必须为 0，否则客户端可以伪造该请求头绕过按 IP 的限流
+    PROXY_FIX_X_FOR = int(os.environ.get('PROXY_FIX_X_FOR', 0))
+    ADMISSION_GLOBAL_RATE = 5.0
+    ADMISSION_GLOBAL_BURST = 20
+    ADMISSION_MAX_INFLIGHT = 8
+    ADMISSION_SLOT_RETRY_AFTER = 5
+
+    # /api/metrics 暴露内部计数器，默认关闭
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '').lower() in ('1', 'true', 'yes')
+
+    # 模型分级路由：短作文 / 简短追问走 turbo，其余走 LLM_DEFAULT_TIER；
+    # 预计延迟超过 LLM_LATENCY_BUDGET（秒）或请求剩余时间时降档，快档输出未通过校验时最多升级 LLM_MAX_ESCALATIONS 次
+    LLM_ROUTING_ENABLED = True
+    LLM_TIERS = {
+        'turbo': {'model': 'qwen-turbo', 'expected_latency': 10.0},
+        'plus': {'model': 'qwen-plus', 'expected_latency': 25.0},
+        'max': {'model': 'qwen-max', 'expected_latency': 45.0},
+    }
+    LLM_TIER_ORDER = ['turbo', 'plus', 'max']
+    LLM_DEFAULT_TIER = 'plus'
+    LLM_LATENCY_BUDGET = 60.0
+    LLM_SHORT_ESSAY_WORDS = 200
+    LLM_SHORT_QUESTION_CHARS = 80
+    LLM_MAX_ESCALATIONS = 1
+
+    # 端到端截止时间（秒）：客户端可用 X-Request-Timeout 缩短，但不超过 REQUEST_TIMEOUT_MAX
+    REQUEST_TIMEOUT_DEFAULT = 90
+    REQUEST_TIMEOUT_MAX = 120
+
+    # 对冲请求：调用超过该档位延迟的 LLM_HEDGE_PERCENTILE 分位数（样本不足时用 LLM_HEDGE_DELAY 秒）
+    # 仍未返回时再发一个相同请求；对冲数量不超过主请求的 LLM_HEDGE_MAX_RATIO
+    LLM_HEDGING_ENABLED = False
+    LLM_HEDGE_PERCENTILE = 95
+    LLM_HEDGE_DELAY = 20.0
+    LLM_HEDGE_MAX_RATIO = 0.1
+    LLM_EXECUTOR_WORKERS = 16
+
+    # 本地分数预估模型文件（train-scorer 生成），为空时使用 instance/score_model.npz
+    SCORE_MODEL_PATH = os.environ.get('SCORE_MODEL_PATH')
+
+    # build-assets 的输出目录，为空时使用 static/dist
+    ASSET_OUTPUT_DIR = os.environ.get('ASSET_OUTPUT_DIR')
+
+    # 作文归档：超过多少天的作文移入冷存储，热表中保留的题目前缀长度
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 365))
+    ARCHIVE_TOPIC_PREFIX = 120
+
+    # 题目任务分析（warm-topic-analysis 生成），路径为空时使用 instance/topic_analysis.json
+    TOPIC_ANALYSIS_ENABLED = True
+    TOPIC_ANALYSIS_PATH = os.environ.get('TOPIC_ANALYSIS_PATH')
+    TOPIC_ANALYSIS_CACHE_SIZE = 1024
+
+class DevelopmentConfig(Config):
     DEBUG = True
+
+class ProductionConfig(Config):
+    # 生产环境不使用任何默认值：缺少时 create_app 直接报错，而不是用公开的开发密钥或本地 SQLite 启动
+    SECRET_KEY = os.environ.get('SECRET_KEY')
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
+    SQLALCHEMY_BINDS = {
+        'archive': os.environ.get('ARCHIVE_DATABASE_URL') or SQLALCHEMY_DATABASE_URI,
+    }
+    REQUIRED_SETTINGS = {'SECRET_KEY': 'SECRET_KEY', 'SQLALCHEMY_DATABASE_URI': 'DATABASE_URL'}
+    PRELOAD_HEAVY_MODULES = True
+
+class TestingConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    SQLALCHEMY_BINDS = {'archive': 'sqlite://'}
+    SECRET_KEY = 'testing-secret-key'
+    ADMISSION_ENABLED = False
+
+config_by_name = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'testing': TestingConfig,
+}
+
+def get_config(name=None):
+    """根据名称（或 APP_CONFIG 环境变量）返回配置类，默认为开发配置"""
+    name = name or os.environ.get('APP_CONFIG', 'development')
+    return config_by_name.get(name, DevelopmentConfig)
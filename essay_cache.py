@@ -0,0 +1,67 @@
+"""
+作文详情的进程内缓存
+
+批改记录保存后不会再修改，详情响应可以当作不可变资源：
+序列化、压缩后的结果按作文 id 缓存（按条数和字节数双重限制的 LRU），
+重复查看时不需要查询数据库，也不需要重新解析 JSON 字段。
+缓存条目记录作者 id，命中时仍然检查归属。
+"""
+
+import threading
+from collections import OrderedDict
+
+from flask import current_app
+
+# 一年；immutable 让浏览器在有效期内连条件请求都不发
+IMMUTABLE_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+
+class DetailCache:
+    def __init__(self, max_entries=512, max_bytes=32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, essay_id):
+        """返回 (user_id, payload) 或 None"""
+        with self._lock:
+            entry = self._data.get(essay_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(essay_id)
+            self.hits += 1
+            return entry
+
+    def put(self, essay_id, user_id, payload):
+        with self._lock:
+            old = self._data.pop(essay_id, None)
+            if old is not None:
+                self.bytes -= old[1].size
+            self._data[essay_id] = (user_id, payload)
+            self.bytes += payload.size
+            while self._data and (len(self._data) > self.max_entries or self.bytes > self.max_bytes):
+                _, (_, evicted) = self._data.popitem(last=False)
+                self.bytes -= evicted.size
+
+    def invalidate(self, essay_id):
+        with self._lock:
+            old = self._data.pop(essay_id, None)
+            if old is not None:
+                self.bytes -= old[1].size
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._data), 'bytes': self.bytes, 'hits': self.hits, 'misses': self.misses}
+
+def get_cache():
+    return current_app.extensions['essay_detail_cache']
+
+def init_app(app):
+    app.extensions['essay_detail_cache'] = DetailCache(
+        max_entries=app.config.get('ESSAY_DETAIL_CACHE_SIZE', 512),
+        max_bytes=app.config.get('ESSAY_DETAIL_CACHE_BYTES', 32 * 1024 * 1024)
+    )
@@ -0,0 +1,134 @@
+"""
+批改历史导出（CSV / JSONL）
+
+按 id 做 keyset 分批读取（每批 EXPORT_CHUNK_SIZE 行），只查询选中的列，
+读出的是 Core 行而不是 ORM 对象，不会堆积在 session 的 identity map 里。
+已归档的作文每批用一次查询从冷存储读回。
+每批之间不持有数据库游标，客户端下载再慢也不会长时间占用 SQLite 读事务。
+内存占用与作文总数无关。
+"""
+
+import csv
+import io
+import json
+
+from sqlalchemy import select
+
+from models import db, Essay
+import archive
+
+FORMATS = ('csv', 'jsonl')
+
+EXPORT_CHUNK_SIZE = 200
+
+# 可导出的列（与 essay 表字段同名），默认全部导出
+EXPORT_COLUMNS = (
+    'id',
+    'created_at',
+    'topic',
+    'content',
+    'overall_score',
+    'task_achievement_score',
+    'coherence_cohesion_score',
+    'lexical_resource_score',
+    'grammatical_range_accuracy_score',
+    'linking_words_count',
+    'word_repetition_count',
+    'grammar_mistakes_count',
+    'overall_feedback',
+    'task_achievement_feedback',
+    'coherence_cohesion_feedback',
+    'lexical_resource_feedback',
+    'grammatical_range_accuracy_feedback',
+    'grammar_corrections',
+    'vocabulary_improvements',
+)
+
+# 以 JSON 文本存储的列：JSONL 中还原为对象，CSV 中保留原始 JSON 文本
+JSON_COLUMNS = {
+    'task_achievement_feedback',
+    'coherence_cohesion_feedback',
+    'lexical_resource_feedback',
+    'grammatical_range_accuracy_feedback',
+    'grammar_corrections',
+    'vocabulary_improvements',
+}
+
+def parse_columns(value):
+    """解析逗号分隔的列名，未知列名抛出 ValueError"""
+    if not value:
+        return list(EXPORT_COLUMNS)
+    columns = [c.strip() for c in value.split(',') if c.strip()]
+    unknown = [c for c in columns if c not in EXPORT_COLUMNS]
+    if unknown:
+        raise ValueError(f'unknown columns: {", ".join(unknown)}')
+    return columns
+
+def iter_essay_rows(user_id, columns, since=None, until=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """按 id 升序分批读取某个用户的作文，逐行产出只包含所选列的 Row"""
+    table = Essay.__table__
+    selected = [table.c.id] + [table.c[name] for name in columns if name != 'id']
+    # 需要冷数据时总是带上 content，用来判断该行是否已归档
+    if 'content' not in columns and any(name in archive.ARCHIVED_FIELDS for name in columns):
+        selected.append(table.c.content)
+
+    base = select(*selected).where(table.c.user_id == user_id)
+    if since:
+        base = base.where(table.c.created_at >= since)
+    if until:
+        base = base.where(table.c.created_at < until)
+
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            base.where(table.c.id > last_id).order_by(table.c.id).limit(chunk_size)
+        ).all()
+        if not rows:
+            break
+        yield from archive.hydrate_rows(rows)
+        last_id = rows[-1].id
+        if len(rows) < chunk_size:
+            break
+
+def export_value(row, column, fmt):
+    value = getattr(row, column)
+    if column == 'created_at':
+        return value.isoformat() if value else None
+    if column in JSON_COLUMNS and fmt == 'jsonl':
+        return json.loads(value) if value else None
+    return value
+
+def generate_csv(rows, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    # BOM 让 Excel 正确识别 UTF-8 中文
+    buffer.write('\ufeff')
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow(['' if v is None else v for v in (export_value(row, c, 'csv') for c in columns)])
+        if buffer.tell() >= 64 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def generate_jsonl(rows, columns):
+    lines = []
+    size = 0
+    for row in rows:
+        line = json.dumps({c: export_value(row, c, 'jsonl') for c in columns}, ensure_ascii=False) + '\n'
+        lines.append(line)
+        size += len(line)
+        if size >= 64 * 1024:
+            yield ''.join(lines)
+            lines = []
+            size = 0
+    yield ''.join(lines)
+
+def generate_export(user_id, fmt, columns, since=None, until=None):
+    """返回逐块产出导出内容的生成器"""
+    rows = iter_essay_rows(user_id, columns, since=since, until=until)
+    if fmt == 'csv':
+        return generate_csv(rows, columns)
+    return generate_jsonl(rows, columns)
@@ -0,0 +1,264 @@
+"""
+批改结果的容错解析与部分结果抢救
+
+模型输出经常只有小毛病：结尾多余的逗号、被 max_tokens 截断、JSON 前后夹杂说明文字、
+字符串里没有转义的双引号。以前 json.loads 一失败就整段丢弃并返回假的 6.0 分。
+
+- parse：先按标准 JSON 解析，失败时修复后再解析
+- repair_json：逐字符扫描修复上述问题；被截断时退回到最后一个完整的值，再补齐括号
+- split_sections / missing_sections：按批改结果的各个部分（总体、四项分数、统计、
+  四个评分维度）检查完整性，能用的部分保留，缺失的部分再单独向模型要
+- ParseStats：解析失败率、抢救成功率等计数器
+
+本模块不依赖 Flask / DashScope。
+"""
+
+import json
+import math
+import threading
+
+from routing import CRITERIA, is_score
+
+# 批改结果的组成部分 -> 对应的顶层字段
+SECTIONS = {
+    'overall': ('overall_score', 'overall_feedback'),
+    'rubric_scores': ('rubric_scores',),
+    'statistics': ('statistics',),
+    'task_achievement': ('task_achievement',),
+    'coherence_cohesion': ('coherence_cohesion',),
+    'lexical_resource': ('lexical_resource',),
+    'grammatical_range_accuracy': ('grammatical_range_accuracy',),
+}
+
+# 各维度除 score / strengths / areas_for_improvement 外必须有的字段
+CRITERION_DETAIL = {
+    'task_achievement': ('improvement_suggestions', dict),
+    'coherence_cohesion': ('improvement_suggestions', dict),
+    'lexical_resource': ('vocabulary_improvements', list),
+    'grammatical_range_accuracy': ('grammar_corrections', list),
+}
+
+STATISTICS_FIELDS = ('linking_words_count', 'word_repetition_count', 'grammar_mistakes_count')
+
+# 单独补要某个部分时给的 max_tokens
+SECTION_MAX_TOKENS = {
+    'overall': 400,
+    'rubric_scores': 120,
+    'statistics': 150,
+    'task_achievement': 700,
+    'coherence_cohesion': 700,
+    'lexical_resource': 900,
+    'grammatical_range_accuracy': 1000,
+}
+
+def strip_fences(text):
+    """去掉 ```json ... ``` 标记"""
+    text = text.strip()
+    if text.startswith('```'):
+        text = text[3:]
+        if text.startswith('json'):
+            text = text[4:]
+    if text.endswith('```'):
+        text = text[:-3]
+    return text.strip()
+
+def _next_significant(text, i):
+    while i < len(text) and text[i] in ' \t\r\n':
+        i += 1
+    return text[i] if i < len(text) else ''
+
+def _rstrip_commas(out):
+    while out and (out[-1].isspace() or out[-1] == ','):
+        out.pop()
+
+# 说明文字里也可能有 {，最多尝试从这么多个 { 开始修复
+MAX_REPAIR_STARTS = 16
+
+def repair_json(text):
+    """
+    修复常见缺陷后返回 JSON 文本；找不到可用的 JSON 时抛出 ValueError。
+
+    依次从每个 { 开始尝试，直到修复结果是非空的 JSON 对象（前面的说明文字中可能也有花括号）：
+    - { 之前、与之匹配的 } 之后的文字都丢弃
+    - } 和 ] 之前多余的逗号删除
+    - 字符串中的双引号如果后面不是 , : } ] 或结尾，视为内容并转义；裸换行转义为 \\n
+    - 文本被截断时回到最后一个完整的值，再按顺序补齐未闭合的括号
+    """
+    start = text.find('{')
+    if start < 0:
+        raise ValueError('no JSON object found')
+
+    error = None
+    for _ in range(MAX_REPAIR_STARTS):
+        try:
+            repaired = _repair_from(text, start)
+            if json.loads(repaired):
+                return repaired
+        except ValueError as e:
+            error = e
+        start = text.find('{', start + 1)
+        if start < 0:
+            break
+    raise ValueError(f'unrepairable JSON: {error}' if error else 'no non-empty JSON object found')
+
+def _repair_from(text, start):
+    """从 text[start]（一个 {）开始扫描修复，规则见 repair_json"""
+    out = []
+    stack = []
+    in_string = False
+    safe = None          # (输出长度, 当时未闭合的括号)
+    i, n = start, len(text)
+    while i < n:
+        c = text[i]
+        if in_string:
+            if c == '\\':
+                if i + 1 >= n:
+                    break
+                out.append(text[i:i + 2])
+                i += 2
+                continue
+            if c == '"':
+                if _next_significant(text, i + 1) in (',', ':', '}', ']', ''):
+                    in_string = False
+                    out.append(c)
+                else:
+                    out.append('\\"')
+            elif c == '\n':
+                out.append('\\n')
+            elif c == '\t':
+                out.append('\\t')
+            elif c >= ' ':
+                out.append(c)
+            i += 1
+            continue
+
+        if c == '"':
+            in_string = True
+            out.append(c)
+        elif c in '{[':
+            stack.append(c)
+            out.append(c)
+            safe = (len(out), tuple(stack))
+        elif c in '}]':
+            _rstrip_commas(out)
+            if not stack:
+                break
+            opener = stack.pop()
+            out.append('}' if opener == '{' else ']')
+            if not stack:
+                return ''.join(out)
+            safe = (len(out), tuple(stack))
+        elif c == ',':
+            safe = (len(out), tuple(stack))
+            out.append(c)
+        else:
+            out.append(c)
+        i += 1
+
+    # 被截断：回到最后一个完整的值（安全点只记录在 { [ 之后、逗号之前和闭合括号之后）
+    if safe is None:
+        raise ValueError('JSON truncated before any complete value')
+    length, open_brackets = safe
+    out = out[:length]
+    _rstrip_commas(out)
+    out.extend('}' if b == '{' else ']' for b in reversed(open_brackets))
+    return ''.join(out)
+
+def parse(text):
+    """
+    解析模型输出，返回 (对象, 是否经过修复)；修复后仍无法解析时抛出 ValueError
+    """
+    cleaned = strip_fences(text)
+    try:
+        return json.loads(cleaned), False
+    except json.JSONDecodeError:
+        pass
+    return json.loads(repair_json(cleaned)), True
+
+def _is_count(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value >= 0
+
+def section_complete(name, feedback):
+    """某个部分是否完整可用"""
+    if name == 'overall':
+        return is_score(feedback.get('overall_score')) and isinstance(feedback.get('overall_feedback'), str)
+    value = feedback.get(name)
+    if not isinstance(value, dict):
+        return False
+    if name == 'rubric_scores':
+        return all(is_score(value.get(c)) for c in CRITERIA)
+    if name == 'statistics':
+        return all(_is_count(value.get(f)) for f in STATISTICS_FIELDS)
+    detail, kind = CRITERION_DETAIL[name]
+    return (is_score(value.get('score'))
+            and isinstance(value.get('strengths'), list)
+            and isinstance(value.get('areas_for_improvement'), list)
+            and isinstance(value.get(detail), kind))
+
+def split_sections(obj):
+    """从（可能不完整的）解析结果中取出所有完整的部分"""
+    if not isinstance(obj, dict):
+        return {}
+    complete = {}
+    for name, keys in SECTIONS.items():
+        if section_complete(name, obj):
+            complete.update((key, obj[key]) for key in keys)
+    return complete
+
+def overall_band(scores):
+    """四项平均分取到最近的半分（.25 / .75 向上）"""
+    return math.floor(sum(scores) / len(scores) * 2 + 0.5) / 2
+
+def fill_derived(feedback):
+    """缺少的四项分数 / 总分可以由已有部分算出时直接补上，不必再请求模型"""
+    if not section_complete('rubric_scores', feedback) and all(section_complete(c, feedback) for c in CRITERIA):
+        feedback['rubric_scores'] = {c: feedback[c]['score'] for c in CRITERIA}
+    if not is_score(feedback.get('overall_score')) and section_complete('rubric_scores', feedback):
+        feedback['overall_score'] = overall_band([feedback['rubric_scores'][c] for c in CRITERIA])
+    return feedback
+
+def merge(collected, sections):
+    """把新拿到的部分合并进已有结果（已有的不覆盖），返回 collected"""
+    for key, value in sections.items():
+        collected.setdefault(key, value)
+    return fill_derived(collected)
+
+def missing_sections(feedback):
+    return [name for name in SECTIONS if not section_complete(name, feedback)]
+
+class ParseStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.responses = 0        # 收到的模型回复
+        self.clean = 0            # 直接就是合法且完整的 JSON
+        self.repaired = 0         # 修复后才能解析
+        self.unparseable = 0      # 修复后也无法解析
+        self.partial = 0          # 解析出来但缺少部分内容
+        self.section_requests = 0
+        self.sections_requested = 0
+        self.sections_recovered = 0
+        self.defective = 0        # 至少收到一次有缺陷回复的批改请求
+        self.salvaged = 0         # 其中最终拼出了完整结果的
+        self.fallbacks = 0        # 最终只能返回占位结果
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'responses': self.responses,
+                'clean': self.clean,
+                'repaired': self.repaired,
+                'unparseable': self.unparseable,
+                'partial': self.partial,
+                'section_requests': self.section_requests,
+                'sections_requested': self.sections_requested,
+                'sections_recovered': self.sections_recovered,
+                'defective': self.defective,
+                'salvaged': self.salvaged,
+                'fallbacks': self.fallbacks,
+                'parse_failure_rate': round((self.responses - self.clean) / self.responses, 4) if self.responses else None,
+                'salvage_rate': round(self.salvaged / self.defective, 4) if self.defective else None,
+            }
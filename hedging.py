@@ -0,0 +1,164 @@
+"""
+截止时间传递与对冲请求（hedged requests）
+
+- Deadline：请求携带的剩余时间预算，向下传给每一次模型调用
+- call_with_deadline：在线程池中执行阻塞调用，最多等待到截止时间；
+  如果给了 hedge_delay，主调用超过该延迟仍未返回时再发一个相同的请求，
+  取先成功返回的结果，另一个忽略（DashScope 同步调用无法真正取消，
+  所以调用方要把剩余时间作为 HTTP 超时传给 SDK，被放弃的调用不会一直占着线程池）
+- 返回值不满足 accept 的调用（例如 DashScope 以 status_code 429 / 500 报告的失败）视为失败，
+  继续等待另一个调用
+- HedgePolicy：有上限的对冲额度（按主请求数的比例补充），避免在后端变慢时成倍放大负载
+
+本模块不依赖 Flask / DashScope，可以直接用假的后端测试（见 benchmarks/hedging.py）。
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+class DeadlineExceeded(TimeoutError):
+    """截止时间前没有拿到结果"""
+
+class Deadline:
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def __repr__(self):
+        return f'<Deadline {self.remaining():.1f}s left>'
+
+class HedgePolicy:
+    """
+    限制对冲请求数量：每个主请求积累 max_ratio 个对冲额度，额度最多攒到 burst，
+    每次对冲花掉 1 个。平时用不掉的额度不会无限累积，后端变慢时对冲最多只多出 burst 个，
+    之后按 max_ratio 的比例进行
+    """
+
+    def __init__(self, enabled=False, max_ratio=0.1, burst=2, default_delay=20.0, percentile=95):
+        self.enabled = enabled
+        self.max_ratio = max_ratio
+        self.burst = burst
+        self.default_delay = default_delay
+        self.percentile = percentile
+        self.credit = burst
+        self.primaries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.deadline_exceeded = 0
+        self._lock = threading.Lock()
+
+    def record_primary(self):
+        with self._lock:
+            self.primaries += 1
+            # 上限至少为 1，否则额度永远攒不够一次对冲
+            self.credit = min(max(1, self.burst), self.credit + self.max_ratio)
+
+    def try_hedge(self):
+        with self._lock:
+            if not self.enabled or self.credit < 1:
+                return False
+            self.credit -= 1
+            self.hedges += 1
+            return True
+
+    def record_hedge_win(self):
+        with self._lock:
+            self.hedge_wins += 1
+
+    def record_deadline_exceeded(self):
+        with self._lock:
+            self.deadline_exceeded += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'primaries': self.primaries,
+                'hedges': self.hedges,
+                'credit': round(self.credit, 2),
+                'hedge_wins': self.hedge_wins,
+                'deadline_exceeded': self.deadline_exceeded,
+            }
+
+_executor = None
+_executor_lock = threading.Lock()
+_executor_workers = 16
+
+def configure_executor(workers):
+    global _executor_workers
+    _executor_workers = workers
+
+def get_executor():
+    """线程池在第一次使用时才创建，避免在 pre-fork 主进程中启动线程"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=_executor_workers, thread_name_prefix='llm')
+    return _executor
+
+def call_with_deadline(fn, deadline, hedge_delay=None, policy=None, accept=None):
+    """
+    执行 fn()，最多等到 deadline；返回第一个成功（且满足 accept）的结果。
+    所有尝试都失败时返回最后一个不满足 accept 的结果，没有这样的结果则抛出最后一个异常；
+    超时抛出 DeadlineExceeded
+    """
+    if deadline.expired():
+        raise DeadlineExceeded('deadline already expired')
+
+    executor = get_executor()
+    if policy is not None:
+        policy.record_primary()
+    primary = executor.submit(fn)
+    pending = {primary}
+    last_error = None
+    last_rejected = None
+
+    hedge_at = None
+    if hedge_delay is not None and policy is not None and policy.enabled:
+        hedge_at = time.monotonic() + hedge_delay
+
+    while pending:
+        remaining = deadline.remaining()
+        if remaining <= 0:
+            break
+        timeout = remaining if hedge_at is None else max(0.0, min(remaining, hedge_at - time.monotonic()))
+        done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+        for future in done:
+            try:
+                result = future.result()
+            except Exception as e:
+                last_error = e
+                continue
+            if accept is not None and not accept(result):
+                last_rejected = result
+                continue
+            for loser in pending:
+                loser.cancel()
+            if future is not primary:
+                policy.record_hedge_win()
+            return result
+
+        if hedge_at is not None and time.monotonic() >= hedge_at:
+            hedge_at = None
+            # 主请求已经失败时不再对冲，直接把异常抛出
+            if primary in pending and policy.try_hedge():
+                pending.add(executor.submit(fn))
+
+    for future in pending:
+        future.cancel()
+    if pending or (last_error is None and last_rejected is None):
+        if policy is not None:
+            policy.record_deadline_exceeded()
+        raise DeadlineExceeded(f'no response within {deadline.seconds:.1f}s')
+    if last_rejected is not None:
+        return last_rejected
+    raise last_error
@@ -0,0 +1,117 @@
+"""
+用户身份缓存
+
+Flask-Login 每个请求都会调用 user_loader。这里缓存的是轻量的 UserSnapshot
+（不含 password_hash，附带 UserStats），由一次 User LEFT JOIN UserStats 查询加载。
+缓存命中时认证路径和 /api/user/profile 都不需要访问数据库。
+
+缓存是进程内的 LRU，带 TTL：本进程内资料或统计变化时显式 invalidate，
+其他 worker 进程中的副本最多在 TTL 后过期。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from flask_login import UserMixin
+
+from models import db, User, UserStats
+
+STAT_FIELDS = (
+    'total_essays',
+    'average_score',
+    'avg_task_achievement',
+    'avg_coherence_cohesion',
+    'avg_lexical_resource',
+    'avg_grammatical_range_accuracy',
+)
+
+class UserSnapshot(UserMixin):
+    """只读的用户快照，作为 current_user 使用"""
+
+    def __init__(self, id, username, email, created_at, stats):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.created_at = created_at
+        self.stats = stats
+
+    def __repr__(self):
+        return f'<UserSnapshot {self.username}>'
+
+class IdentityCache:
+    """线程安全、带 TTL 的 LRU 缓存"""
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+def get_cache():
+    return current_app.extensions['identity_cache']
+
+def query_snapshot(user_id):
+    """一次查询同时加载用户资料和统计信息"""
+    row = db.session.query(
+        User.id, User.username, User.email, User.created_at,
+        *[getattr(UserStats, field) for field in STAT_FIELDS]
+    ).outerjoin(UserStats, UserStats.user_id == User.id)\
+     .filter(User.id == user_id)\
+     .first()
+
+    if row is None:
+        return None
+
+    stats = {field: getattr(row, field) or 0 for field in STAT_FIELDS}
+    return UserSnapshot(row.id, row.username, row.email, row.created_at, stats)
+
+def load_snapshot(user_id):
+    """先查缓存，未命中时查询数据库并写入缓存"""
+    cache = get_cache()
+    snapshot = cache.get(user_id)
+    if snapshot is None:
+        snapshot = query_snapshot(user_id)
+        if snapshot is not None:
+            cache.put(user_id, snapshot)
+    return snapshot
+
+def invalidate(user_id):
+    """用户资料或统计信息变化后调用"""
+    get_cache().invalidate(user_id)
+
+def init_app(app):
+    app.extensions['identity_cache'] = IdentityCache(
+        maxsize=app.config.get('IDENTITY_CACHE_SIZE', 1024),
+        ttl=app.config.get('IDENTITY_CACHE_TTL', 300)
+    )
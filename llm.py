@@ -0,0 +1,491 @@
+"""
+通义千问（DashScope）调用封装
+
+DashScope SDK 导入较慢，只在第一次真正调用模型时才导入，
+这样测试、命令行工具和 worker 启动都不需要为它付出代价。
+"""
+
+import hashlib
+import re
+import threading
+import time
+from contextlib import nullcontext
+
+from config import Config
+from coalescing import SingleFlight
+from routing import ModelRouter
+import feedback_repair
+import task_analysis
+import hedging
+from hedging import Deadline, DeadlineExceeded, HedgePolicy
+
+_generation = None
+_generation_lock = threading.Lock()
+
+def get_generation():
+    """返回 dashscope.Generation，首次调用时才导入并配置 API key"""
+    global _generation
+    if _generation is None:
+        with _generation_lock:
+            if _generation is None:
+                import dashscope
+                from dashscope import Generation
+                if Config.DASHSCOPE_API_KEY:
+                    dashscope.api_key = Config.DASHSCOPE_API_KEY
+                _generation = Generation
+    return _generation
+
+# 模型分级路由，参数在 init_app 时从应用配置读取
+router = ModelRouter()
+
+# 对冲请求（默认关闭）
+hedge_policy = HedgePolicy()
+
+def init_app(app):
+    router.configure(app.config)
+    hedge_policy.enabled = app.config.get('LLM_HEDGING_ENABLED', False)
+    hedge_policy.max_ratio = app.config.get('LLM_HEDGE_MAX_RATIO', 0.1)
+    hedge_policy.default_delay = app.config.get('LLM_HEDGE_DELAY', 20.0)
+    hedge_policy.percentile = app.config.get('LLM_HEDGE_PERCENTILE', 95)
+    hedging.configure_executor(app.config.get('LLM_EXECUTOR_WORKERS', 16))
+
+def preload():
+    """在 pre-fork 主进程中提前导入 SDK（不会建立任何网络连接）"""
+    get_generation()
+
+def call_qwen(prompt, max_tokens, temperature=0.7, model='qwen-plus', timeout=None):
+    """调用通义千问模型，返回 DashScope 原始响应；timeout 为 HTTP 请求超时（秒）"""
+    kwargs = {'request_timeout': timeout} if timeout is not None else {}
+    return get_generation().call(
+        model=model,
+        prompt=prompt,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        **kwargs
+    )
+
+# 同一篇作文同时被多次提交时（例如老师投影范文，全班同时点击批改），只调用一次模型
+grading_flight = SingleFlight()
+
+def grading_key(essay_topic, essay_text):
+    """规范化空白后的 (题目, 作文) 哈希"""
+    normalized = '\x00'.join(re.sub(r'\s+', ' ', part).strip() for part in (essay_topic, essay_text))
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+def grading_in_flight(essay_topic, essay_text):
+    """相同作文是否正在批改中（新请求会直接合并，不产生新的模型调用）"""
+    return grading_flight.is_in_flight(grading_key(essay_topic, essay_text))
+
+def grade_essay(essay_topic, essay_text, guard=None, deadline=None, guard_errors=()):
+    """
+    批改作文；与正在进行中的相同请求合并。返回 (批改结果, 是否真正由模型批改)，
+    第二项为 False 时结果是 fallback 占位内容（其中的示例纠错不是学生真实的错误）。
+    guard 是只在真正调用模型时进入的上下文管理器（例如准入控制），
+    guard_errors 是它拒绝时抛出的异常类型：leader 被拒绝时 follower 不跟着失败，而是自己重试
+    """
+    deadline = deadline or Deadline(router.latency_budget)
+
+    def run():
+        with guard() if guard else nullcontext():
+            return generate_feedback(essay_topic, essay_text, deadline)
+
+    try:
+        (feedback, graded), coalesced = grading_flight.do(grading_key(essay_topic, essay_text), run,
+                                                timeout=deadline.remaining(), unshared=guard_errors)
+    except TimeoutError:
+        print("Timed out waiting for an in-flight analysis of the same essay")
+        return create_fallback_response(), False
+    if coalesced:
+        print("Joined an in-flight analysis of the same essay")
+    return feedback, graded
+
+def metrics():
+    """LLM 调用相关的进程内计数器"""
+    return {
+        'grading_coalescing': grading_flight.stats(),
+        'model_tiers': router.metrics(),
+        'hedging': hedge_policy.stats(),
+        'feedback_parsing': parse_stats.stats(),
+        'task_analysis': task_analysis.cache.stats(),
+    }
+
+def invoke(route, prompt, deadline):
+    """
+    在截止时间内调用模型；开启对冲时，超过该档位延迟的指定分位数后再发一个相同请求。
+    status_code 不是 200 的响应算作失败，另一个调用还在进行时继续等待它
+    """
+    hedge_delay = None
+    if hedge_policy.enabled:
+        hedge_delay = (router.latency_percentile(route.tier, route.request_type, hedge_policy.percentile)
+                       or hedge_policy.default_delay)
+
+    def call():
+        # 剩余时间作为 HTTP 超时传给 SDK：截止时间一到调用就结束，不会在线程池里继续占着线程；
+        # 在线程池中排队到截止时间之后的调用直接放弃
+        remaining = deadline.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded('deadline expired before the call started')
+        return call_qwen(prompt, max_tokens=route.max_tokens, model=route.model, timeout=remaining)
+
+    return hedging.call_with_deadline(
+        call,
+        deadline,
+        hedge_delay=hedge_delay,
+        policy=hedge_policy,
+        accept=lambda response: response.status_code == 200
+    )
+
+# 批改结果各部分的 JSON 结构说明；完整批改用全部部分，补要缺失部分时只用其中几项
+SECTION_SCHEMAS = {
+    'overall': """    "overall_score": 分数(0-9),
+    "overall_feedback": "总体反馈\"""",
+    'rubric_scores': """    "rubric_scores": {
+        "task_achievement": 分数(0-9),
+        "coherence_cohesion": 分数(0-9),
+        "lexical_resource": 分数(0-9),
+        "grammatical_range_accuracy": 分数(0-9)
+    }""",
+    'statistics': """    "statistics": {
+        "linking_words_count": 连词数量,
+        "linking_words_goal": 7,
+        "word_repetition_count": 重复词汇数量,
+        "word_repetition_goal": 3,
+        "grammar_mistakes_count": 语法错误数量,
+        "grammar_mistakes_goal": 0
+    }""",
+    'task_achievement': """    "task_achievement": {
+        "score": 分数(0-9),
+        "strengths": ["优势1", "优势2"],
+        "areas_for_improvement": ["改进点1", "改进点2"],
+        "improvement_suggestions": {
+            "how_to_address_prompt": "如何完整回应题目",
+            "how_to_develop_ideas": "如何展开观点",
+            "how_to_stay_on_topic": "如何点题",
+            "contextual_development": "上下文展开建议",
+            "better_format": "更优的格式建议",
+            "text_structure": "行文结构建议"
+        }
+    }""",
+    'coherence_cohesion': """    "coherence_cohesion": {
+        "score": 分数(0-9),
+        "strengths": ["优势1", "优势2"],
+        "areas_for_improvement": ["改进点1", "改进点2"],
+        "improvement_suggestions": {
+            "logical_organization": "逻辑组织建议",
+            "thematic_organization": "主题组织建议",
+            "logical_sequencing": "逻辑衔接顺序建议",
+            "referencing_substitution": "引用替换建议",
+            "discourse_markers": "标志性逻辑提示词建议"
+        }
+    }""",
+    'lexical_resource': """    "lexical_resource": {
+        "score": 分数(0-9),
+        "strengths": ["优势1", "优势2"],
+        "areas_for_improvement": ["改进点1", "改进点2"],
+        "vocabulary_improvements": [
+            {
+                "incorrect": "错误表达",
+                "correct": "正确表达",
+                "explanation": "详细解释错误原因和正确用法",
+                "error_type": "错误类型（如：介词错误、代词错误等）"
+            }
+        ]
+    }""",
+    'grammatical_range_accuracy': """    "grammatical_range_accuracy": {
+        "score": 分数(0-9),
+        "strengths": ["优势1", "优势2"],
+        "areas_for_improvement": ["改进点1", "改进点2"],
+        "grammar_corrections": [
+            {
+                "incorrect": "错误语法",
+                "correct": "正确语法",
+                "explanation": "详细解释语法错误原因和正确用法",
+                "error_type": "错误类型（如：时态错误、主谓一致错误等）",
+                "sentence_context": "包含错误的完整句子"
+            }
+        ]
+    }""",
+}
+
+def json_schema(sections):
+    return '{\n' + ',\n'.join(SECTION_SCHEMAS[name] for name in sections) + '\n}'
+
+def task_hint_section(task_hint):
+    if not task_hint:
+        return ''
+    return f"""
+题目分析（已预先完成，评分时直接参考，无需重新审题）：
+{task_hint}
+"""
+
+def build_grading_prompt(essay_topic, essay_text, task_hint=None):
+    """构建批改提示词；task_hint 是预先计算的题目任务分析"""
+    return f"""
+你是一位专业的雅思写作评分专家。请对以下雅思作文进行详细分析，并按照雅思官方评分标准给出反馈。
+
+题目: {essay_topic}
+
+作文内容:
+{essay_text}
+{task_hint_section(task_hint)}
+请按照雅思官方四项评分标准进行评分，并按照以下JSON格式返回分析结果，使用中文回复：
+
+{json_schema(SECTION_SCHEMAS)}
+
+评分标准说明：
+1. Task Achievement (任务完成度): 是否完全回应题目要求，观点是否清晰，论证是否充分
+2. Coherence and Cohesion (连贯与衔接): 文章结构是否清晰，段落间连接是否自然，逻辑是否连贯
+3. Lexical Resource (词汇资源): 词汇使用是否准确、多样，是否适合学术写作
+4. Grammatical Range and Accuracy (语法范围和准确性): 语法结构是否多样，语法错误是否影响理解
+
+请特别注意：
+1. 严格按照雅思官方评分标准进行评分，每项给出0-9分的具体分数
+2. 在grammar_corrections和vocabulary_improvements中，请提供具体的错误分析
+3. 在statistics中统计连词数量、重复词汇数量和语法错误数量
+4. 对于每个错误，请提供包含该错误的完整句子作为上下文
+5. 错误解释要具体，如："介词的语法错误：应使用 'From a social perspective' 而不是 'In the social point of view'"
+
+请确保返回的是有效的JSON格式，不要包含任何其他文本。
+"""
+
+# 解析失败率、抢救成功率等计数
+parse_stats = feedback_repair.ParseStats()
+
+def parse_feedback_text(feedback_text):
+    """
+    容错解析模型返回的批改结果，返回 (所有完整的部分, 回复是否有缺陷)。
+    完全无法解析时返回 ({}, True)
+    """
+    parse_stats.incr('responses')
+    try:
+        parsed, repaired = feedback_repair.parse(feedback_text)
+    except ValueError as e:
+        print(f"JSON解析错误: {e}")
+        print(f"原始响应: {feedback_text}")
+        parse_stats.incr('unparseable')
+        return {}, True
+
+    sections = feedback_repair.fill_derived(feedback_repair.split_sections(parsed))
+    missing = feedback_repair.missing_sections(sections)
+    if repaired:
+        parse_stats.incr('repaired')
+    if missing:
+        parse_stats.incr('partial')
+    if not repaired and not missing:
+        parse_stats.incr('clean')
+    return sections, repaired or bool(missing)
+
+def build_section_prompt(essay_topic, essay_text, sections, task_hint=None):
+    """只要求模型补充缺失部分的小提示词（补 Task Achievement 时带上题目分析）"""
+    if 'task_achievement' not in sections:
+        task_hint = None
+    return f"""
+你是一位专业的雅思写作评分专家。这篇雅思作文的批改结果缺少下面几个部分，请只补充这些部分，使用中文回复。
+
+题目: {essay_topic}
+
+作文内容:
+{essay_text}
+{task_hint_section(task_hint)}
+请严格按照雅思官方评分标准（每项0-9分），按照以下JSON格式返回：
+
+{json_schema(sections)}
+
+请确保返回的是有效的JSON格式，不要包含任何其他文本。
+"""
+
+def request_missing_sections(essay_topic, essay_text, missing, route, deadline, task_hint=None):
+    """用小提示词补要缺失的部分，返回补到的完整部分（可能为空）"""
+    section_route = route._replace(
+        request_type='grading_sections',
+        max_tokens=sum(feedback_repair.SECTION_MAX_TOKENS[name] for name in missing)
+    )
+    parse_stats.incr('section_requests')
+    parse_stats.incr('sections_requested', len(missing))
+
+    started = time.monotonic()
+    try:
+        prompt = build_section_prompt(essay_topic, essay_text, missing, task_hint)
+        response = invoke(section_route, prompt, deadline)
+    except Exception as e:
+        print(f"补充批改内容时发生错误: {e}")
+        router.record(section_route, None, ok=False)
+        return {}
+
+    recovered = {}
+    latency = time.monotonic() - started
+    if response.status_code == 200:
+        try:
+            parsed, _ = feedback_repair.parse(response.output.text)
+            recovered = feedback_repair.split_sections(parsed)
+        except ValueError as e:
+            print(f"补充内容JSON解析错误: {e}")
+    router.record(section_route, latency if response.status_code == 200 else None, ok=bool(recovered))
+    return recovered
+
+def generate_ielts_feedback(essay_topic, essay_text, deadline=None):
+    """
+    Generate comprehensive IELTS feedback using Qwen (通义千问)
+
+    模型调用失败时返回 fallback 占位结果；需要区分两者时使用 generate_feedback
+    """
+    return generate_feedback(essay_topic, essay_text, deadline)[0]
+
+def generate_feedback(essay_topic, essay_text, deadline=None):
+    """
+    返回 (批改结果, 是否真正由模型批改)；第二项为 False 时结果是 fallback 占位内容。
+
+    按作文长度和剩余时间选择模型档位。回复有缺陷时先修复、保留所有完整的部分，
+    只为缺失的部分再发一次小请求；一个完整部分都没有时升级到更大的模型重试。
+    每次调用都不会超过 deadline
+    """
+    print("Using Qwen model for essay analysis...")
+    
+    deadline = deadline or Deadline(router.latency_budget)
+    task_hint = task_analysis.hint_for(essay_topic)
+    prompt = build_grading_prompt(essay_topic, essay_text, task_hint)
+    route = router.choose_grading(essay_text, budget=deadline.remaining())
+    collected = {}
+    defective = False
+    
+    while route is not None:
+        call_started = time.monotonic()
+        try:
+            # 调用通义千问模型
+            response = invoke(route, prompt, deadline)
+        except DeadlineExceeded as e:
+            print(f"通义千问响应超时: {e}")
+            router.record(route, None, ok=False)
+            break
+        except Exception as e:
+            print(f"调用通义千问时发生错误: {e}")
+            router.record(route, None, ok=False)
+            break
+        
+        latency = time.monotonic() - call_started
+        if response.status_code != 200:
+            print(f"通义千问API调用失败: {response.status_code}")
+            router.record(route, None, ok=False)
+            break
+        
+        # 容错解析，之前几次调用中已经拿到的完整部分保留
+        sections, had_defects = parse_feedback_text(response.output.text)
+        defective = defective or had_defects
+        feedback_repair.merge(collected, sections)
+        missing = feedback_repair.missing_sections(collected)
+        router.record(route, latency, ok=not missing)
+        
+        if missing and collected and not deadline.expired():
+            print(f"{route.model} 返回结果缺少: {', '.join(missing)}，单独补充")
+            feedback_repair.merge(collected, request_missing_sections(essay_topic, essay_text, missing, route, deadline, task_hint))
+            still_missing = feedback_repair.missing_sections(collected)
+            parse_stats.incr('sections_recovered', len(missing) - len(still_missing))
+            missing = still_missing
+        
+        if not missing:
+            if defective:
+                parse_stats.incr('defective')
+                parse_stats.incr('salvaged')
+            return collected, True
+        
+        print(f"{route.model} 返回结果不完整: {', '.join(missing)}")
+        route = router.escalate(route, remaining=deadline.remaining())
+    
+    # 模型调用失败，或升级后仍然拿不到完整结果，返回fallback响应
+    if defective:
+        parse_stats.incr('defective')
+    parse_stats.incr('fallbacks')
+    return create_fallback_response(), False
+
+def chat_reply(prompt, question, deadline=None):
+    """
+    辅导对话：短追问走快档；返回回复文本，调用失败时返回 None，
+    超过 deadline 时抛出 DeadlineExceeded
+    """
+    deadline = deadline or Deadline(router.latency_budget)
+    route = router.choose_chat(question, budget=deadline.remaining())
+    while route is not None:
+        started = time.monotonic()
+        response = invoke(route, prompt, deadline)
+        latency = time.monotonic() - started if response.status_code == 200 else None
+        ok = response.status_code == 200 and bool(response.output.text.strip())
+        router.record(route, latency, ok=ok)
+        if ok:
+            return response.output.text
+        if response.status_code != 200:
+            return None
+        route = router.escalate(route, remaining=deadline.remaining())
+    return None
+
+def create_fallback_response():
+    """Create a fallback response if AI generation fails"""
+    return {
+        "overall_score": 6.0,
+        "overall_feedback": "The essay addresses the topic with some relevant points, but there are areas for improvement in task response, coherence, vocabulary, and grammar.",
+        "rubric_scores": {
+            "task_achievement": 6,
+            "coherence_cohesion": 6,
+            "lexical_resource": 6,
+            "grammatical_range_accuracy": 6
+        },
+        "statistics": {
+            "linking_words_count": 3,
+            "linking_words_goal": 7,
+            "word_repetition_count": 5,
+            "word_repetition_goal": 3,
+            "grammar_mistakes_count": 2,
+            "grammar_mistakes_goal": 0
+        },
+        "task_achievement": {
+            "score": 6,
+            "strengths": ["Addresses both advantages and disadvantages", "Provides some reasoning"],
+            "areas_for_improvement": ["Needs deeper exploration", "Points could be more developed"],
+            "improvement_suggestions": {
+                "how_to_address_prompt": "Ensure you fully explore each advantage and disadvantage with detailed explanations.",
+                "how_to_develop_ideas": "Use specific examples to support your arguments.",
+                "how_to_stay_on_topic": "Always relate your points back to the main topic.",
+                "contextual_development": "Start with a clear thesis and summarize main points in conclusion.",
+                "better_format": "Use traditional essay structure: introduction, body paragraphs, conclusion.",
+                "text_structure": "Organize ideas logically within paragraphs."
+            }
+        },
+        "coherence_cohesion": {
+            "score": 6,
+            "strengths": ["Clear introduction and conclusion", "Some use of linking words"],
+            "areas_for_improvement": ["Lacks clear topic sentences", "Ideas could be better sequenced"],
+            "improvement_suggestions": {
+                "logical_organization": "Organize ideas in a structured manner with logical sequence.",
+                "thematic_organization": "Each paragraph should have a clear topic sentence.",
+                "logical_sequencing": "Ensure each paragraph flows logically from one point to the next.",
+                "referencing_substitution": "Use pronouns and referencing words effectively.",
+                "discourse_markers": "Use more varied linking words and phrases."
+            }
+        },
+        "lexical_resource": {
+            "score": 6,
+            "strengths": ["Adequate vocabulary range"],
+            "areas_for_improvement": ["Limited vocabulary variety", "Some spelling errors"],
+            "vocabulary_improvements": [
+                {
+                    "incorrect": "In the social point of view",
+                    "correct": "From a social perspective",
+                    "explanation": "介词的语法错误：应使用 'From a social perspective' 而不是 'In the social point of view'。'From a social perspective' 是更准确和自然的表达方式。",
+                    "error_type": "介词错误"
+                }
+            ]
+        },
+        "grammatical_range_accuracy": {
+            "score": 6,
+            "strengths": ["Generally clear meaning"],
+            "areas_for_improvement": ["Some grammatical errors", "Inconsistent tenses"],
+            "grammar_corrections": [
+                {
+                    "incorrect": "We are making him to try hard",
+                    "correct": "We encourage them to try hard",
+                    "explanation": "及物动词使用错误：不需要使用'making him to'，可以直接用'encourage them to'。同时代词单复数错误：应该用 'them' 而不是 'the child'，因为在之前的句子中提到了'children'。",
+                    "error_type": "及物动词错误、代词单复数错误",
+                    "sentence_context": "We are making him to try hard in his studies."
+                }
+            ]
+        }
+    }
@@ -2,6 +2,7 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from datetime import datetime
 import json
+import re
 
 db = SQLAlchemy()
 
@@ -76,6 +77,21 @@ class Essay(db.Model):
     def __repr__(self):
         return f'<Essay {self.id} by User {self.user_id}>'
 
+class EssayArchive(db.Model):
+    """
+    归档作文的冷数据：正文、完整题目和全部反馈，zlib 压缩的 JSON。
+    使用 archive 绑定，可以放在独立的 SQLite 文件中（见 archive.py）
+    """
+    __bind_key__ = 'archive'
+
+    essay_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    payload = db.Column(db.LargeBinary, nullable=False)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<EssayArchive {self.essay_id}>'
+
 class Conversation(db.Model):
     """对话记录模型"""
     id = db.Column(db.Integer, primary_key=True)
@@ -112,3 +128,117 @@ class UserStats(db.Model):
     
     def __repr__(self):
         return f'<UserStats for User {self.user_id}>'
+
+class EssayDailyRollup(db.Model):
+    """每个用户每天的分数汇总（每次保存作文时增量维护，用于进度曲线）"""
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'day', name='uq_rollup_user_day'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    essay_count = db.Column(db.Integer, nullable=False, default=0)
+
+    # 各项分数的总和 / 最低 / 最高
+    overall_sum = db.Column(db.Float, nullable=False, default=0.0)
+    overall_min = db.Column(db.Float)
+    overall_max = db.Column(db.Float)
+    task_achievement_sum = db.Column(db.Float, nullable=False, default=0.0)
+    task_achievement_min = db.Column(db.Float)
+    task_achievement_max = db.Column(db.Float)
+    coherence_cohesion_sum = db.Column(db.Float, nullable=False, default=0.0)
+    coherence_cohesion_min = db.Column(db.Float)
+    coherence_cohesion_max = db.Column(db.Float)
+    lexical_resource_sum = db.Column(db.Float, nullable=False, default=0.0)
+    lexical_resource_min = db.Column(db.Float)
+    lexical_resource_max = db.Column(db.Float)
+    grammatical_range_accuracy_sum = db.Column(db.Float, nullable=False, default=0.0)
+    grammatical_range_accuracy_min = db.Column(db.Float)
+    grammatical_range_accuracy_max = db.Column(db.Float)
+
+    # 汇总项 -> Essay 上对应的分数字段
+    CRITERIA = {
+        'overall': 'overall_score',
+        'task_achievement': 'task_achievement_score',
+        'coherence_cohesion': 'coherence_cohesion_score',
+        'lexical_resource': 'lexical_resource_score',
+        'grammatical_range_accuracy': 'grammatical_range_accuracy_score',
+    }
+
+    def add_essay(self, essay):
+        """把一篇作文的分数累加进当天的汇总"""
+        self.essay_count = (self.essay_count or 0) + 1
+        for name, field in self.CRITERIA.items():
+            score = getattr(essay, field) or 0.0
+            setattr(self, f'{name}_sum', (getattr(self, f'{name}_sum') or 0.0) + score)
+            current_min = getattr(self, f'{name}_min')
+            current_max = getattr(self, f'{name}_max')
+            setattr(self, f'{name}_min', score if current_min is None else min(current_min, score))
+            setattr(self, f'{name}_max', score if current_max is None else max(current_max, score))
+
+    @classmethod
+    def record(cls, essay):
+        """在当前事务中把作文计入对应用户、对应日期的汇总行"""
+        day = (essay.created_at or datetime.utcnow()).date()
+        rollup = cls.query.filter_by(user_id=essay.user_id, day=day).first()
+        if not rollup:
+            rollup = cls(user_id=essay.user_id, day=day, essay_count=0)
+            db.session.add(rollup)
+        rollup.add_essay(essay)
+        return rollup
+
+    def __repr__(self):
+        return f'<EssayDailyRollup User {self.user_id} {self.day}>'
+
+class CorrectionEntry(db.Model):
+    """语法 / 词汇纠错的规范化索引（每个错误类型一行），用于错误类型统计"""
+    __tablename__ = 'correction_entry'
+    __table_args__ = (
+        db.Index('ix_correction_user_type', 'user_id', 'error_type'),
+        db.Index('ix_correction_created_type', 'created_at', 'error_type'),
+    )
+
+    KINDS = ('grammar', 'vocabulary')
+
+    # LLM 常把多个错误类型写在一起，如 "及物动词错误、代词单复数错误"
+    ERROR_TYPE_SEPARATORS = re.compile(r'[、,，;；/]')
+
+    id = db.Column(db.Integer, primary_key=True)
+    essay_id = db.Column(db.Integer, db.ForeignKey('essay.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    kind = db.Column(db.String(16), nullable=False)
+    error_type = db.Column(db.String(64), nullable=False)
+    incorrect = db.Column(db.Text)
+    correct = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    @classmethod
+    def split_error_types(cls, error_type):
+        types = [t.strip() for t in cls.ERROR_TYPE_SEPARATORS.split(error_type or '')]
+        return [t[:64] for t in types if t] or ['未分类']
+
+    @classmethod
+    def record(cls, essay):
+        """把作文的语法纠正和词汇改进写入索引（在当前事务中，不提交）"""
+        entries = []
+        for kind, items in (('grammar', essay.get_grammar_corrections()),
+                            ('vocabulary', essay.get_vocabulary_improvements())):
+            for item in items:
+                if not isinstance(item, dict):
+                    continue
+                for error_type in cls.split_error_types(item.get('error_type')):
+                    entries.append(cls(
+                        essay_id=essay.id,
+                        user_id=essay.user_id,
+                        kind=kind,
+                        error_type=error_type,
+                        incorrect=item.get('incorrect'),
+                        correct=item.get('correct'),
+                        created_at=essay.created_at or datetime.utcnow()
+                    ))
+        db.session.add_all(entries)
+        return entries
+
+    def __repr__(self):
+        return f'<CorrectionEntry {self.kind}:{self.error_type} Essay {self.essay_id}>'
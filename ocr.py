@@ -0,0 +1,39 @@
+"""
+图片转文字（Tesseract OCR）
+
+PIL 和 pytesseract 都在第一次识别时才导入；是否可用只通过 find_spec 探测，
+不会在启动时真正加载这些模块。
+"""
+
+import importlib.util
+import io
+
+_available = None
+
+def is_available():
+    """pytesseract 是否已安装（结果会被缓存）"""
+    global _available
+    if _available is None:
+        _available = importlib.util.find_spec('pytesseract') is not None
+        if not _available:
+            print("Warning: pytesseract not available. Image-to-text feature will be disabled.")
+    return _available
+
+def preload():
+    """在 pre-fork 主进程中提前导入 OCR 依赖"""
+    if is_available():
+        import PIL.Image  # noqa: F401
+        import pytesseract  # noqa: F401
+
+def image_to_text(image_bytes):
+    """识别图片中的英文文字"""
+    from PIL import Image
+    import pytesseract
+
+    image = Image.open(io.BytesIO(image_bytes))
+
+    # Convert to RGB if necessary
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    return pytesseract.image_to_string(image, lang='eng')
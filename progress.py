@@ -0,0 +1,86 @@
+"""
+分数进度曲线
+
+数据来自 EssayDailyRollup（每个用户每天一行），查询代价只和天数有关，
+与用户写过多少篇作文无关。按周 / 按月的分桶和移动平均在内存中完成。
+"""
+
+from datetime import date, timedelta
+
+from models import db, Essay, EssayDailyRollup
+
+PERIODS = ('day', 'week', 'month')
+
+def bucket_start(day, period):
+    """返回某天所在分桶的起始日期（周从周一开始）"""
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day
+
+def progress_series(user_id, period='week', window=4, since=None, until=None):
+    """
+    返回按 period 分桶的分数序列，每个桶包含篇数、各项平均 / 最低 / 最高分，
+    以及最近 window 个桶按篇数加权的移动平均
+    """
+    query = EssayDailyRollup.query.filter_by(user_id=user_id)
+    if since:
+        query = query.filter(EssayDailyRollup.day >= since)
+    if until:
+        query = query.filter(EssayDailyRollup.day <= until)
+    rollups = query.order_by(EssayDailyRollup.day).all()
+
+    buckets = []
+    for rollup in rollups:
+        start = bucket_start(rollup.day, period)
+        if not buckets or buckets[-1]['start'] != start:
+            buckets.append({'start': start, 'count': 0, 'sum': {}, 'min': {}, 'max': {}})
+        bucket = buckets[-1]
+        bucket['count'] += rollup.essay_count
+        for name in EssayDailyRollup.CRITERIA:
+            bucket['sum'][name] = bucket['sum'].get(name, 0.0) + getattr(rollup, f'{name}_sum')
+            low = getattr(rollup, f'{name}_min')
+            high = getattr(rollup, f'{name}_max')
+            bucket['min'][name] = low if name not in bucket['min'] else min(bucket['min'][name], low)
+            bucket['max'][name] = high if name not in bucket['max'] else max(bucket['max'][name], high)
+
+    series = []
+    for i, bucket in enumerate(buckets):
+        recent = buckets[max(0, i - window + 1):i + 1]
+        recent_count = sum(b['count'] for b in recent)
+        series.append({
+            'period_start': bucket['start'].isoformat(),
+            'essay_count': bucket['count'],
+            'average': {name: round(total / bucket['count'], 2) for name, total in bucket['sum'].items()},
+            'min': bucket['min'],
+            'max': bucket['max'],
+            'moving_average': {
+                name: round(sum(b['sum'][name] for b in recent) / recent_count, 2)
+                for name in EssayDailyRollup.CRITERIA
+            },
+        })
+    return series
+
+def rebuild_rollups(user_id=None):
+    """根据 Essay 表重建汇总（用于历史数据回填），返回处理的作文篇数"""
+    rollups = EssayDailyRollup.query
+    essays = Essay.query
+    if user_id is not None:
+        rollups = rollups.filter_by(user_id=user_id)
+        essays = essays.filter_by(user_id=user_id)
+    rollups.delete(synchronize_session=False)
+
+    cache = {}
+    processed = 0
+    for essay in essays.order_by(Essay.id).yield_per(500):
+        day = essay.created_at.date() if essay.created_at else date.today()
+        key = (essay.user_id, day)
+        if key not in cache:
+            cache[key] = EssayDailyRollup(user_id=key[0], day=key[1], essay_count=0)
+            db.session.add(cache[key])
+        cache[key].add_essay(essay)
+        processed += 1
+
+    db.session.commit()
+    return processed
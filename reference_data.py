@@ -0,0 +1,35 @@
+"""
+静态参考数据：连接词（connection.json）和热门题目（hottopic.json）
+"""
+
+import json
+import os
+import re
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def load_conjunctions():
+    """读取连接词数据（connection.json 是每行一个字符串的松散格式）"""
+    with open(os.path.join(BASE_DIR, 'connection.json'), 'r', encoding='utf-8') as f:
+        # Read the file as text and split by lines
+        content = f.read().strip()
+        # Remove the outer braces and split by comma
+        if content.startswith('{') and content.endswith('}'):
+            content = content[1:-1]
+        # Split by comma and clean up
+        lines = [line.strip().rstrip(',') for line in content.split(',')]
+        # Remove quotes around each line
+        return [line.strip('"') for line in lines if line.strip()]
+
+def load_hot_topics():
+    with open(os.path.join(BASE_DIR, 'hottopic.json'), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def linking_phrases():
+    """connection.json 中 "常用连接词：" 后列出的全部英文连接词（小写、去重）"""
+    with open(os.path.join(BASE_DIR, 'connection.json'), 'r', encoding='utf-8') as f:
+        content = f.read()
+    phrases = set()
+    for group in re.findall(r'常用连接词：([^"]+)"', content):
+        phrases.update(p.strip().lower() for p in group.split(',') if p.strip())
+    return sorted(phrases)
@@ -0,0 +1,139 @@
+"""
+响应层：更快的 JSON 序列化 + 按 Accept-Encoding 协商的 gzip/brotli 压缩
+
+- 安装了 orjson 时用它做序列化，否则回退到标准库 json；
+  两种情况下都直接输出 UTF-8（不转义中文），中文反馈的体积约为 \\uXXXX 转义的一半
+- 超过 COMPRESS_MIN_SIZE 的 JSON/文本响应会被压缩；安装了 brotli 时优先使用 br
+- 热门题目、连接词等静态参考数据只序列化、压缩一次（PrecompressedPayload）
+"""
+
+import gzip
+import hashlib
+import json
+
+from flask import request, current_app
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/x-ndjson',
+    'text/html',
+    'text/plain',
+    'text/csv',
+    'text/css',
+    'application/javascript',
+    'text/javascript',
+}
+
+class FastJSONProvider(DefaultJSONProvider):
+    """优先使用 orjson 的 JSON provider"""
+
+    ensure_ascii = False
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs:
+            return dumps_bytes(obj).decode('utf-8')
+        kwargs.setdefault('default', self.default)
+        kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+        kwargs.setdefault('sort_keys', self.sort_keys)
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype=self.mimetype)
+
+def dumps_bytes(obj):
+    """把对象序列化为 UTF-8 字节串"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=DefaultJSONProvider.default,
+                                option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass
+    return json.dumps(obj, ensure_ascii=False, default=DefaultJSONProvider.default).encode('utf-8')
+
+def compress(body, encoding, level=None):
+    """用指定编码压缩字节串"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=4 if level is None else level)
+    return gzip.compress(body, compresslevel=6 if level is None else level, mtime=0)
+
+def supported_encodings():
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+def negotiate_encoding():
+    """根据请求的 Accept-Encoding 选出最合适的压缩编码，没有则返回 None"""
+    return request.accept_encodings.best_match(supported_encodings())
+
+def compress_response(response):
+    """after_request 钩子：压缩足够大的文本类响应"""
+    if (response.status_code < 200 or response.status_code >= 300
+            or response.direct_passthrough
+            or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+
+    body = response.get_data()
+    if len(body) < current_app.config.get('COMPRESS_MIN_SIZE', 1024):
+        return response
+
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return response
+
+    response.set_data(compress(body, encoding, current_app.config.get('COMPRESS_LEVEL')))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+class PrecompressedPayload:
+    """序列化并预先压缩好的不变 JSON 数据"""
+
+    def __init__(self, obj, gzip_level=9, br_quality=11, cache_control=None):
+        self.body = dumps_bytes(obj)
+        self.etag = hashlib.sha1(self.body).hexdigest()
+        self.cache_control = cache_control
+        self.encoded = {'gzip': compress(self.body, 'gzip', gzip_level)}
+        if brotli is not None:
+            self.encoded['br'] = compress(self.body, 'br', br_quality)
+
+    @property
+    def size(self):
+        return len(self.body) + sum(len(b) for b in self.encoded.values())
+
+    def to_response(self):
+        encoding = negotiate_encoding()
+        body = self.encoded.get(encoding, self.body)
+        response = current_app.response_class(body, mimetype='application/json')
+        # 强 ETag 需要区分不同的内容编码
+        etag = self.etag
+        if encoding in self.encoded:
+            response.headers['Content-Encoding'] = encoding
+            etag = f'{etag}-{encoding}'
+        response.vary.add('Accept-Encoding')
+        if self.cache_control:
+            response.headers['Cache-Control'] = self.cache_control
+        response.set_etag(etag)
+        return response.make_conditional(request)
+
+def init_app(app):
+    app.json = FastJSONProvider(app)
+    app.after_request(compress_response)
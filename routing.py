@@ -0,0 +1,164 @@
+"""
+模型分级路由
+
+根据请求类型、作文长度和延迟预算选择模型档位（turbo / plus / max）和 max_tokens。
+快档输出未通过结构校验时可以升级到下一档重试一次。
+每个 (档位, 请求类型) 记录调用次数、失败次数、升级次数和最近成功调用的延迟分布，用来判断路由是否划算。
+"""
+
+import threading
+from collections import namedtuple, deque
+
+Route = namedtuple('Route', 'request_type tier model max_tokens escalations')
+
+CRITERIA = (
+    'task_achievement',
+    'coherence_cohesion',
+    'lexical_resource',
+    'grammatical_range_accuracy',
+)
+
+DEFAULT_TIERS = {
+    'turbo': {'model': 'qwen-turbo', 'expected_latency': 10.0},
+    'plus': {'model': 'qwen-plus', 'expected_latency': 25.0},
+    'max': {'model': 'qwen-max', 'expected_latency': 45.0},
+}
+
+def is_score(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and 0 <= value <= 9
+
+class TierStats:
+    """
+    某个档位上某种请求的统计。latencies 只记录拿到了模型回复的调用：
+    异常、非 200 和超时的调用只计入 failures，否则接近 0 或等于整个预算的耗时会扭曲分位数
+    """
+
+    def __init__(self, window=512):
+        self.calls = 0
+        self.failures = 0
+        self.escalations = 0
+        self.latencies = deque(maxlen=window)
+
+    def percentile(self, p):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    def to_dict(self):
+        return {
+            'calls': self.calls,
+            'failures': self.failures,
+            'escalations': self.escalations,
+            'latency_p50': self.percentile(50),
+            'latency_p95': self.percentile(95),
+        }
+
+class ModelRouter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.configure({})
+
+    def configure(self, config):
+        """从 Flask 配置（或任意 dict）读取路由参数"""
+        self.enabled = config.get('LLM_ROUTING_ENABLED', True)
+        self.tiers = config.get('LLM_TIERS', DEFAULT_TIERS)
+        self.order = config.get('LLM_TIER_ORDER', ['turbo', 'plus', 'max'])
+        self.default_tier = config.get('LLM_DEFAULT_TIER', 'plus')
+        self.latency_budget = config.get('LLM_LATENCY_BUDGET', 60.0)
+        self.short_essay_words = config.get('LLM_SHORT_ESSAY_WORDS', 200)
+        self.short_question_chars = config.get('LLM_SHORT_QUESTION_CHARS', 80)
+        self.max_escalations = config.get('LLM_MAX_ESCALATIONS', 1)
+        with self._lock:
+            # (档位, 请求类型) -> TierStats；追问、完整批改、补要部分内容的输出长度差别很大，分开统计
+            self.stats = {}
+
+    def _stats(self, tier, request_type):
+        """调用方需持有 self._lock"""
+        key = (tier, request_type)
+        stats = self.stats.get(key)
+        if stats is None:
+            stats = self.stats[key] = TierStats()
+        return stats
+
+    def expected_latency(self, tier, request_type):
+        """有足够样本时用观测到的 p90，否则用配置的估计值"""
+        observed = self.latency_percentile(tier, request_type, 90)
+        return observed if observed is not None else self.tiers[tier]['expected_latency']
+
+    def latency_percentile(self, tier, request_type, p, min_samples=20):
+        """某档位上某种请求最近延迟的 p 分位数；样本不足时返回 None"""
+        with self._lock:
+            stats = self.stats.get((tier, request_type))
+            if stats is None or len(stats.latencies) < min_samples:
+                return None
+            return stats.percentile(p)
+
+    def fit_budget(self, tier, request_type, budget):
+        """如果档位预计超出预算，降到预算内最大的档位（都超出时用最快的一档）"""
+        if budget is None or self.expected_latency(tier, request_type) <= budget:
+            return tier
+        candidates = [t for t in self.order[:self.order.index(tier)]
+                      if self.expected_latency(t, request_type) <= budget]
+        return candidates[-1] if candidates else self.order[0]
+
+    def routing_budget(self, remaining=None):
+        """选档位用的延迟预算：请求剩余时间和 LLM_LATENCY_BUDGET 中较小的一个"""
+        return self.latency_budget if remaining is None else min(remaining, self.latency_budget)
+
+    def route(self, tier, request_type, max_tokens, escalations=0):
+        return Route(request_type, tier, self.tiers[tier]['model'], max_tokens, escalations)
+
+    def choose_grading(self, essay_text, budget=None):
+        words = len(essay_text.split())
+        max_tokens = min(4000, 2000 + words * 8)
+        if not self.enabled:
+            return self.route(self.default_tier, 'grading', 4000)
+
+        tier = self.order[0] if words < self.short_essay_words else self.default_tier
+        budget = self.routing_budget(budget)
+        return self.route(self.fit_budget(tier, 'grading', budget), 'grading', max_tokens)
+
+    def choose_chat(self, question, budget=None):
+        if not self.enabled:
+            return self.route(self.default_tier, 'chat', 1000)
+
+        if len(question) < self.short_question_chars:
+            tier, max_tokens = self.order[0], 600
+        else:
+            tier, max_tokens = self.default_tier, 1000
+        budget = self.routing_budget(budget)
+        return self.route(self.fit_budget(tier, 'chat', budget), 'chat', max_tokens)
+
+    def escalate(self, route, remaining=None):
+        """返回更大一档的路由；已是最大档、达到升级上限或剩余时间不够时返回 None"""
+        position = self.order.index(route.tier)
+        if route.escalations >= self.max_escalations or position + 1 >= len(self.order):
+            return None
+        tier = self.order[position + 1]
+        if remaining is not None and self.expected_latency(tier, route.request_type) > remaining:
+            return None
+        with self._lock:
+            self._stats(route.tier, route.request_type).escalations += 1
+        return self.route(tier, route.request_type, route.max_tokens, route.escalations + 1)
+
+    def record(self, route, latency, ok):
+        """
+        记录一次调用。latency 为 None 表示没有拿到模型回复（异常、非 200、超时），
+        只计入失败次数；拿到回复但内容不完整时 latency 有效，ok 为 False
+        """
+        with self._lock:
+            stats = self._stats(route.tier, route.request_type)
+            stats.calls += 1
+            if not ok:
+                stats.failures += 1
+            if latency is not None:
+                stats.latencies.append(latency)
+
+    def metrics(self):
+        """{档位: {请求类型: 统计}}"""
+        with self._lock:
+            metrics = {tier: {} for tier in self.order}
+            for (tier, request_type), stats in sorted(self.stats.items()):
+                metrics.setdefault(tier, {})[request_type] = stats.to_dict()
+            return metrics
@@ -0,0 +1,246 @@
+"""
+本地分数预估（只用 CPU，毫秒级）
+
+在等待大模型批改的同时先给出一个临时分数。特征是纯文本统计量
+（长度、词汇多样性、连接词密度、句子复杂度、与题目的相关度等），
+模型是多输出岭回归（标准化后求闭式解），一次同时预测总分和四项分数。
+
+训练：flask --app app train-scorer   （数据来自 Essay 表，模型保存为 .npz）
+"""
+
+import math
+import os
+import re
+import threading
+import time
+
+import numpy as np
+from flask import current_app
+
+from models import db, Essay
+from reference_data import linking_phrases
+import archive
+
+TARGETS = (
+    'overall_score',
+    'task_achievement_score',
+    'coherence_cohesion_score',
+    'lexical_resource_score',
+    'grammatical_range_accuracy_score',
+)
+
+FEATURES = (
+    'log_words',
+    'sentences',
+    'mean_sentence_length',
+    'sentence_length_std',
+    'paragraphs',
+    'type_token_ratio',
+    'root_ttr',
+    'mean_word_length',
+    'long_word_ratio',
+    'linking_density',
+    'distinct_linking',
+    'subordinate_density',
+    'commas_per_sentence',
+    'topic_overlap',
+)
+
+WORD_RE = re.compile(r"[A-Za-z]+(?:'[A-Za-z]+)?")
+SENTENCE_RE = re.compile(r'[^.!?]+[.!?]*')
+
+SUBORDINATORS = {
+    'although', 'because', 'whereas', 'which', 'who', 'whom', 'whose', 'unless',
+    'whether', 'while', 'when', 'where', 'if', 'since', 'though', 'that',
+}
+
+STOPWORDS = {
+    'the', 'a', 'an', 'and', 'or', 'of', 'to', 'in', 'on', 'for', 'is', 'are', 'be',
+    'that', 'this', 'it', 'as', 'with', 'by', 'some', 'others', 'people', 'think',
+    'your', 'you', 'do', 'what', 'their', 'own', 'give', 'discuss', 'both', 'views',
+    'opinion', 'agree', 'disagree', 'extent', 'reasons', 'answer', 'include',
+    'relevant', 'examples', 'from', 'knowledge', 'experience', 'these', 'should',
+}
+
+_linking = None
+
+def get_linking_phrases():
+    """单词连接词集合 + 多词连接词列表（"and" 太常见，不计入）"""
+    global _linking
+    if _linking is None:
+        phrases = [p for p in linking_phrases() if p != 'and']
+        _linking = (
+            {p for p in phrases if ' ' not in p},
+            [p for p in phrases if ' ' in p],
+        )
+    return _linking
+
+def essay_features(topic, text):
+    """提取单篇作文的特征向量（顺序与 FEATURES 一致）"""
+    single_links, multi_links = get_linking_phrases()
+
+    words = [w.lower() for w in WORD_RE.findall(text)]
+    n_words = max(len(words), 1)
+    sentence_lengths = np.array([len(WORD_RE.findall(s)) for s in SENTENCE_RE.findall(text)], dtype=float)
+    sentence_lengths = sentence_lengths[sentence_lengths > 0]
+    n_sentences = max(len(sentence_lengths), 1)
+    if not sentence_lengths.size:
+        sentence_lengths = np.zeros(1)
+    word_lengths = np.array([len(w) for w in words] or [0], dtype=float)
+
+    lowered = ' ' + ' '.join(words) + ' '
+    link_hits = [w for w in words if w in single_links]
+    multi_hits = [p for p in multi_links if f' {p} ' in lowered]
+    n_links = len(link_hits) + sum(lowered.count(f' {p} ') for p in multi_hits)
+    distinct = len(set(link_hits)) + len(multi_hits)
+
+    topic_words = {w.lower() for w in WORD_RE.findall(topic)} - STOPWORDS
+    essay_vocab = set(words)
+    paragraphs = len([p for p in re.split(r'\n\s*\n|\n', text) if p.strip()])
+
+    return [
+        math.log1p(len(words)),
+        n_sentences,
+        float(sentence_lengths.mean()),
+        float(sentence_lengths.std()),
+        paragraphs,
+        len(essay_vocab) / n_words,
+        len(essay_vocab) / math.sqrt(n_words),
+        float(word_lengths.mean()),
+        float((word_lengths >= 7).mean()),
+        100.0 * n_links / n_words,
+        distinct,
+        100.0 * sum(1 for w in words if w in SUBORDINATORS) / n_words,
+        text.count(',') / n_sentences,
+        len(topic_words & essay_vocab) / max(len(topic_words), 1),
+    ]
+
+def feature_matrix(pairs):
+    """[(topic, text), ...] -> (n, len(FEATURES)) 矩阵"""
+    return np.array([essay_features(topic, text) for topic, text in pairs], dtype=float).reshape(-1, len(FEATURES))
+
+def to_band(values):
+    """裁剪到 0-9 并取最接近的半分（雅思分数以 0.5 为单位）"""
+    return np.round(np.clip(values, 0, 9) * 2) / 2
+
+class RidgeScorer:
+    """多输出岭回归：W = (XᵀX + αI)⁻¹ XᵀY，X 先标准化，截距单独求"""
+
+    def __init__(self, mean, scale, weights, intercept, alpha=1.0, trained_on=0):
+        self.mean = mean
+        self.scale = scale
+        self.weights = weights
+        self.intercept = intercept
+        self.alpha = alpha
+        self.trained_on = trained_on
+
+    @classmethod
+    def fit(cls, X, Y, alpha=1.0):
+        mean = X.mean(axis=0)
+        scale = X.std(axis=0)
+        scale[scale == 0] = 1.0
+        Z = (X - mean) / scale
+        intercept = Y.mean(axis=0)
+        A = Z.T @ Z + alpha * np.eye(Z.shape[1])
+        weights = np.linalg.solve(A, Z.T @ (Y - intercept))
+        return cls(mean, scale, weights, intercept, alpha=alpha, trained_on=len(X))
+
+    def predict(self, X):
+        return ((X - self.mean) / self.scale) @ self.weights + self.intercept
+
+    def estimate(self, topic, text):
+        """返回临时分数 dict（总分和四项，均为半分制）"""
+        bands = to_band(self.predict(feature_matrix([(topic, text)]))[0])
+        return dict(zip(TARGETS, (float(b) for b in bands)))
+
+    def save(self, path):
+        np.savez(path, mean=self.mean, scale=self.scale, weights=self.weights,
+                 intercept=self.intercept, alpha=self.alpha, trained_on=self.trained_on,
+                 features=np.array(FEATURES), targets=np.array(TARGETS))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            if tuple(data['features']) != FEATURES or tuple(data['targets']) != TARGETS:
+                raise ValueError('score model was trained with a different feature set')
+            return cls(data['mean'], data['scale'], data['weights'], data['intercept'],
+                       alpha=float(data['alpha']), trained_on=int(data['trained_on']))
+
+def evaluate(model, X, Y, pairs=None):
+    """留出集上的误差和单篇预估耗时"""
+    predicted = to_band(model.predict(X))
+    errors = np.abs(predicted - Y)
+    report = {
+        'essays': int(len(Y)),
+        'mae': dict(zip(TARGETS, np.round(errors.mean(axis=0), 3).tolist())),
+        'within_half_band': dict(zip(TARGETS, np.round((errors <= 0.5).mean(axis=0), 3).tolist())),
+    }
+    if pairs:
+        sample = pairs[:200]
+        started = time.perf_counter()
+        for topic, text in sample:
+            model.estimate(topic, text)
+        report['latency_ms'] = round((time.perf_counter() - started) / len(sample) * 1000, 3)
+    return report
+
+def training_data(fallback_feedback=None, chunk_size=1000):
+    """
+    从 Essay 表读取 (题目, 正文) 和分数。
+    总体反馈等于 fallback 文本的记录是模型调用失败时的占位结果，不参与训练
+    """
+    table = Essay.__table__
+    query = db.select(table.c.id, table.c.topic, table.c.content, table.c.overall_feedback,
+                      *[table.c[t] for t in TARGETS])
+    if fallback_feedback:
+        query = query.where(db.or_(table.c.overall_feedback.is_(None),
+                                   table.c.overall_feedback != fallback_feedback))
+
+    pairs, scores = [], []
+    last_id = 0
+    while True:
+        rows = db.session.execute(query.where(table.c.id > last_id).order_by(table.c.id).limit(chunk_size)).all()
+        if not rows:
+            break
+        for row in archive.hydrate_rows(rows):
+            # 已归档作文的反馈要从冷存储读回后才能判断
+            if fallback_feedback and row.overall_feedback == fallback_feedback:
+                continue
+            pairs.append((row.topic, row.content))
+            scores.append([getattr(row, t) for t in TARGETS])
+        last_id = rows[-1].id
+    return pairs, np.array(scores, dtype=float).reshape(-1, len(TARGETS))
+
+def train(pairs, Y, alpha=1.0, holdout=0.2, seed=0):
+    """按比例留出一部分评估，然后用全部数据重新训练；返回 (模型, 评估报告)"""
+    X = feature_matrix(pairs)
+    order = np.random.default_rng(seed).permutation(len(X))
+    n_test = int(len(X) * holdout)
+    report = None
+    if n_test:
+        test, fit = order[:n_test], order[n_test:]
+        report = evaluate(RidgeScorer.fit(X[fit], Y[fit], alpha), X[test], Y[test],
+                          [pairs[i] for i in test])
+    return RidgeScorer.fit(X, Y, alpha), report
+
+_model_lock = threading.Lock()
+
+def model_path():
+    return current_app.config.get('SCORE_MODEL_PATH') or os.path.join(current_app.instance_path, 'score_model.npz')
+
+def get_scorer():
+    """
+    加载（或在模型文件更新后重新加载）分数预估模型；模型文件不存在时返回 None
+    """
+    path = model_path()
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    cached = current_app.extensions.get('scorer')
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with _model_lock:
+        model = RidgeScorer.load(path)
+        current_app.extensions['scorer'] = (mtime, model)
+    return model
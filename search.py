@@ -0,0 +1,185 @@
+"""
+作文历史全文搜索（SQLite FTS5）
+
+essay_fts 是外部维护的 FTS5 虚拟表，rowid 与 essay.id 相同。
+owner 列存放 "u<user_id>"，查询时作为 MATCH 条件的一部分，
+由 FTS 倒排索引直接完成按用户过滤，而不是匹配全部用户后再筛选。
+
+essay_fts 保存的是所索引列的完整副本，和 Essay 表在同一个（热）库中。
+已归档的作文只按热表中保留的摘要行（题目前缀）索引，正文和反馈不再留在热库里，
+因此归档作文只能按题目搜到。
+"""
+
+import base64
+import html
+import json
+import re
+from datetime import datetime
+
+from sqlalchemy import text
+
+from models import db, Essay
+
+# 排名权重：题目 > 正文 > 总体反馈，owner 列不参与打分
+RANK_EXPR = 'bm25(essay_fts, 2.0, 1.0, 0.5, 0.0)'
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# highlight() / snippet() 先用私有区字符标记命中位置，转义原文后再换成 <mark>
+MARK_OPEN = '\ue000'
+MARK_CLOSE = '\ue001'
+
+class SearchUnavailable(Exception):
+    """当前数据库不支持 FTS5"""
+
+def is_supported():
+    return db.engine.dialect.name == 'sqlite'
+
+def ensure_search_index():
+    """创建 FTS5 虚拟表（已存在时不做任何事）"""
+    if not is_supported():
+        return False
+    db.session.execute(text(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS essay_fts USING fts5("
+        "topic, content, overall_feedback, owner, tokenize='unicode61 remove_diacritics 2')"
+    ))
+    db.session.commit()
+    return True
+
+def index_essay(essay):
+    """把刚保存的作文写入搜索索引（在当前事务的 savepoint 中执行，不提交）"""
+    if not is_supported():
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(
+                text("INSERT OR REPLACE INTO essay_fts(rowid, topic, content, overall_feedback, owner) "
+                     "VALUES (:id, :topic, :content, :overall_feedback, :owner)"),
+                {
+                    'id': essay.id,
+                    'topic': essay.topic,
+                    'content': essay.content,
+                    'overall_feedback': essay.overall_feedback or '',
+                    'owner': f'u{essay.user_id}',
+                }
+            )
+    except Exception as e:
+        # 搜索索引缺失（例如还没执行 init-db）不应影响作文保存
+        print(f"Error indexing essay {essay.id} for search: {e}")
+
+def rebuild_search_index(batch_size=500):
+    """清空并根据 Essay 表重建搜索索引，返回索引的作文篇数"""
+    if not ensure_search_index():
+        raise SearchUnavailable('Full-text search requires SQLite FTS5')
+    db.session.execute(text("DELETE FROM essay_fts"))
+
+    indexed = 0
+    last_id = 0
+    while True:
+        batch = Essay.query.filter(Essay.id > last_id).order_by(Essay.id).limit(batch_size).all()
+        if not batch:
+            break
+        for essay in batch:
+            index_essay(essay)
+        db.session.commit()
+        indexed += len(batch)
+        last_id = batch[-1].id
+    return indexed
+
+def optimize_search_index():
+    """合并 FTS 索引段，真正丢掉被替换 / 删除的旧内容（之后 VACUUM 才能归还磁盘空间）"""
+    if not is_supported():
+        return
+    try:
+        db.session.execute(text("INSERT INTO essay_fts(essay_fts) VALUES('optimize')"))
+        db.session.commit()
+    except Exception as e:
+        print(f"Error optimizing search index: {e}")
+        db.session.rollback()
+
+def build_match_query(query):
+    """把用户输入转换为安全的 FTS5 查询：每个词加引号，最后一个词按前缀匹配"""
+    tokens = TOKEN_RE.findall(query)
+    if not tokens:
+        return None
+    terms = ['"' + token + '"' for token in tokens]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+def encode_cursor(score, essay_id):
+    raw = json.dumps([score, essay_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def decode_cursor(cursor):
+    try:
+        score, essay_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return float(score), int(essay_id)
+    except Exception:
+        raise ValueError('invalid cursor')
+
+def render_marked(value):
+    """转义作文原文中的 HTML，只保留命中位置的 <mark> 标签"""
+    if value is None:
+        return None
+    return html.escape(value).replace(MARK_OPEN, '<mark>').replace(MARK_CLOSE, '</mark>')
+
+def format_timestamp(value):
+    """原生 SQL 查询返回的时间戳是字符串，统一成其他接口使用的格式"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.strftime('%Y/%m/%d %H:%M:%S') if value else None
+
+def search_essays(user_id, query, limit=10, cursor=None):
+    """
+    在指定用户的作文中搜索，按相关度排序。
+    返回 (results, next_cursor)；next_cursor 为 None 表示没有更多结果
+    """
+    if not is_supported():
+        raise SearchUnavailable('Full-text search requires SQLite FTS5')
+
+    match = build_match_query(query)
+    if match is None:
+        return [], None
+
+    params = {
+        'match': f'owner:"u{int(user_id)}" AND ({match})',
+        'limit': limit + 1,
+        'mark_open': MARK_OPEN,
+        'mark_close': MARK_CLOSE,
+    }
+    keyset = ''
+    if cursor:
+        params['after_score'], params['after_id'] = decode_cursor(cursor)
+        keyset = 'WHERE score > :after_score OR (score = :after_score AND id > :after_id)'
+
+    rows = db.session.execute(text(f"""
+        SELECT id, score, topic_snippet, content_snippet, overall_score, created_at
+        FROM (
+            SELECT essay.id AS id,
+                   {RANK_EXPR} AS score,
+                   highlight(essay_fts, 0, :mark_open, :mark_close) AS topic_snippet,
+                   snippet(essay_fts, 1, :mark_open, :mark_close, '…', 24) AS content_snippet,
+                   essay.overall_score AS overall_score,
+                   essay.created_at AS created_at
+            FROM essay_fts
+            JOIN essay ON essay.id = essay_fts.rowid
+            WHERE essay_fts MATCH :match
+        )
+        {keyset}
+        ORDER BY score, id
+        LIMIT :limit
+    """), params).mappings().all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    results = [{
+        'id': row['id'],
+        'topic': render_marked(row['topic_snippet']),
+        'snippet': render_marked(row['content_snippet']),
+        'overall_score': row['overall_score'],
+        'created_at': format_timestamp(row['created_at']),
+    } for row in rows]
+
+    next_cursor = encode_cursor(rows[-1]['score'], rows[-1]['id']) if has_more else None
+    return results, next_cursor
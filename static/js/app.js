@@ -236,6 +236,7 @@ async function submitEssay() {
     }
     
     showLoading();
+    showProvisionalScore(topic, essay);
     
     try {
         const response = await fetch('/api/analyze', {
@@ -266,6 +267,36 @@ async function submitEssay() {
     }
 }
 
+// Show a provisional band from the local estimator while the full analysis runs
+async function showProvisionalScore(topic, essay) {
+    const element = document.getElementById('provisional-score');
+    element.textContent = '';
+    
+    try {
+        const response = await fetch('/api/estimate', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                topic: topic,
+                essay: essay
+            })
+        });
+        
+        if (!response.ok) {
+            return;
+        }
+        
+        const estimate = await response.json();
+        if (document.getElementById('loading-overlay').classList.contains('active')) {
+            element.textContent = `预估分数：${estimate.overall_score.toFixed(1)}（详细批改完成后以正式评分为准）`;
+        }
+    } catch (error) {
+        console.error('Error estimating score:', error);
+    }
+}
+
 // Display feedback
 function displayFeedback(feedback) {
     // Overall score and feedback
@@ -0,0 +1,259 @@
+"""
+题目任务分析缓存
+
+同一道热门题目会被成百上千的学生写到，每次批改模型都要重新分析一遍题目要求什么。
+这里按规范化后的题目文本缓存一份结构化分析（题型、必须回应的部分、关键词），
+作为简短提示放进批改提示词：模型少花 token 在审题上，Task Achievement 的反馈也更一致。
+
+雅思大作文的题型由固定的指令句式决定（"Discuss both views and give your opinion"、
+"To what extent do you agree or disagree" ...），所以分析用规则完成，不额外调用模型。
+
+- 热门题目的分析由 flask --app app warm-topic-analysis 预先生成并保存到 JSON 文件，
+  启动后第一次使用时载入；文件可以人工修订，标记 "edited": true 的条目重新生成时保留
+- 其他题目在第一次批改时分析，放进有上限的 LRU
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from topics import tokenize, STOPWORDS
+
+QUESTION_TYPES = {
+    'discuss_both_views': '讨论双方观点并给出自己的观点',
+    'opinion': '观点类（同意/不同意的程度）',
+    'advantages_disadvantages': '优缺点分析',
+    'advantages_outweigh': '优点是否大于缺点',
+    'positive_negative': '判断积极还是消极的发展',
+    'problem_solution': '问题与解决办法',
+    'causes_effects': '原因与影响',
+    'preference': '二选一并说明理由',
+    'two_part_question': '双问题（每个问题都要回答）',
+    'unknown': '未识别',
+}
+
+# 指令句中的常用词，不作为题目关键词
+INSTRUCTION_WORDS = {
+    'discuss', 'both', 'views', 'view', 'give', 'opinion', 'opinions', 'agree', 'disagree',
+    'extent', 'reasons', 'reason', 'answer', 'examples', 'example', 'knowledge', 'experience',
+    'point', 'share', 'prefer', 'choice', 'specific', 'support', 'statement', 'true', 'think',
+    'advantages', 'disadvantages', 'outweigh', 'positive', 'negative', 'development', 'others',
+    'many', 'nowadays', 'today', 'generally', 'believed', 'claimed', 'say', 'hold', 'however',
+    'some', 'people', 'believe', 'while', 'include', 'relevant', 'own', 'use',
+}
+
+# 常见但不能说明题目内容的词
+COMMON_WORDS = {
+    'get', 'better', 'best', 'just', 'not', 'had', 'over', 'past', 'only', 'because', 'due',
+    'way', 'new', 'things', 'always', 'make', 'doing', 'lots', 'seen', 'certain', 'instance',
+    'sometimes', 'already', 'any', 'anything', 'very', 'much', 'now', 'may', 'might', 'could',
+    'being', 'were', 'was', 'our', 'his', 'her', 'also', 'even', 'especially', 'otherwise',
+    'number', 'variety', 'increasing', 'increased', 'continues', 'become', 'brings',
+}
+
+# 分析规则变化时加一：文件中旧版本的条目（人工修订过的除外）不再使用，改为重新分析
+ANALYSIS_VERSION = 2
+
+SENTENCE_RE = re.compile(r'[^.?!]+[.?!]?')
+
+INSTRUCTION_RE = re.compile(
+    r'\b(discuss|to what extent|do you (agree|think)|give (your|reasons|five)|which do you prefer|'
+    r'use specific|what are|what will|what can|what measures|how (does|true)|is this a|'
+    r'do the advantages|include any)\b',
+    re.I
+)
+
+def normalize_topic(text):
+    """小写、统一引号、合并空白"""
+    text = text.replace('’', "'").replace('‘', "'").replace('“', '"').replace('”', '"')
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+def topic_key(text):
+    return hashlib.sha1(normalize_topic(text).encode('utf-8')).hexdigest()[:16]
+
+def split_sentences(text):
+    sentences = (s.strip(' \'"‘’“”') for s in SENTENCE_RE.findall(text))
+    return [s for s in sentences if s]
+
+def classify(text):
+    lowered = normalize_topic(text)
+    questions = [s for s in split_sentences(text) if s.endswith('?')]
+    if 'discuss' in lowered and re.search(r'opinion|point of view', lowered):
+        # 只有一个观点句的 "Discuss and give your point of view" 实际上是观点类题目，
+        # 按双观点提示会让批改去找不存在的第二种观点
+        if re.search(r'both (views|sides)', lowered) or extract_views(text):
+            return 'discuss_both_views'
+        return 'opinion'
+    if 'outweigh' in lowered:
+        return 'advantages_outweigh'
+    if 'advantages' in lowered and 'disadvantages' in lowered:
+        return 'advantages_disadvantages'
+    if len(questions) >= 2:
+        return 'two_part_question'
+    if 'positive or negative' in lowered:
+        return 'positive_negative'
+    if re.search(r'agree|to what extent', lowered):
+        return 'opinion'
+    if re.search(r'problems?|causes?|reasons?', lowered) and re.search(r'solutions?|measures|what can be done', lowered):
+        return 'problem_solution'
+    if re.search(r'causes?|reasons?', lowered) and re.search(r'effects?|consequences?|impact', lowered):
+        return 'causes_effects'
+    if 'prefer' in lowered:
+        return 'preference'
+    return 'unknown'
+
+def statement_sentences(text):
+    """题目中的背景 / 观点句（去掉指令句和问句）"""
+    return [s for s in split_sentences(text) if not s.endswith('?') and not INSTRUCTION_RE.search(s)]
+
+def extract_views(text):
+    """讨论类题目中的两种观点"""
+    views = []
+    for sentence in statement_sentences(text):
+        views.extend(p.strip(' ,.') for p in re.split(r',\s*while\s+', sentence) if p.strip(' ,.'))
+    return (views[0], views[-1]) if len(views) >= 2 else None
+
+def required_parts(question_type, text):
+    if question_type == 'discuss_both_views':
+        views = extract_views(text)
+        if views:
+            return [f'讨论观点一：{views[0]}', f'讨论观点二：{views[1]}', '明确给出自己的观点']
+        return ['讨论题目中的两种观点', '明确给出自己的观点']
+    if question_type == 'two_part_question':
+        questions = [s for s in split_sentences(text) if s.endswith('?')]
+        return [f'回答问题{i}：{q}' for i, q in enumerate(questions, 1)]
+    return {
+        'opinion': ['明确表明同意/不同意的程度，并在全文保持一致', '用理由和例子支持立场'],
+        'advantages_disadvantages': ['分析优点', '分析缺点'],
+        'advantages_outweigh': ['分析优点', '分析缺点', '明确判断优点是否大于缺点'],
+        'positive_negative': ['明确判断是积极还是消极的发展', '说明理由'],
+        'problem_solution': ['分析问题或原因', '提出对应的解决办法'],
+        'causes_effects': ['分析原因', '分析影响'],
+        'preference': ['明确说明自己的选择', '给出具体理由'],
+    }.get(question_type, [])
+
+def key_terms(text, limit=6):
+    """背景句中的关键词，按出现顺序"""
+    terms = []
+    for word in tokenize(' '.join(statement_sentences(text)) or text):
+        if (len(word) > 2 and word not in terms and word not in STOPWORDS
+                and word not in INSTRUCTION_WORDS and word not in COMMON_WORDS):
+            terms.append(word)
+    return terms[:limit]
+
+def analyze(text):
+    question_type = classify(text)
+    return {
+        'question_type': question_type,
+        'required_parts': required_parts(question_type, text),
+        'key_terms': key_terms(text),
+    }
+
+def format_hint(analysis):
+    """放进批改提示词的简短提示；题型未识别时返回 None"""
+    if not analysis or analysis.get('question_type') == 'unknown':
+        return None
+    lines = [f"- 题型：{QUESTION_TYPES.get(analysis['question_type'], analysis['question_type'])}"]
+    if analysis.get('required_parts'):
+        lines.append('- 必须回应：' + '；'.join(analysis['required_parts']))
+    if analysis.get('key_terms'):
+        lines.append('- 关键词：' + ', '.join(analysis['key_terms']))
+    return '\n'.join(lines)
+
+class AnalysisCache:
+    def __init__(self, path=None, max_entries=1024, enabled=True):
+        self.configure(path, max_entries, enabled)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, path=None, max_entries=1024, enabled=True):
+        self.path = path
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._pinned = None          # 预生成文件中的分析，第一次使用时载入
+        self._recent = OrderedDict()
+
+    def _load(self):
+        pinned = {}
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    pinned = {key: entry['analysis'] for key, entry in json.load(f).items()
+                              if entry.get('edited') or entry.get('version') == ANALYSIS_VERSION}
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                print(f"Error loading topic analysis cache: {e}")
+        return pinned
+
+    def get(self, topic_text):
+        key = topic_key(topic_text)
+        with self._lock:
+            if self._pinned is None:
+                self._pinned = self._load()
+            analysis = self._pinned.get(key) or self._recent.get(key)
+            if analysis is not None:
+                self.hits += 1
+                if key in self._recent:
+                    self._recent.move_to_end(key)
+                return analysis
+            self.misses += 1
+
+        analysis = analyze(topic_text)
+        with self._lock:
+            self._recent[key] = analysis
+            while len(self._recent) > self.max_entries:
+                self._recent.popitem(last=False)
+        return analysis
+
+    def warm(self, topics):
+        """分析 {topic_id: 题目} 中的全部题目并写入文件，返回写入的条数"""
+        entries = {}
+        existing = {}
+        if self.path and os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                existing = json.load(f)
+        for topic_id, text in topics.items():
+            key = topic_key(text)
+            # 人工修订过的条目保留
+            if existing.get(key, {}).get('edited'):
+                entries[key] = existing[key]
+                continue
+            entries[key] = {'topic_id': topic_id, 'topic': text, 'version': ANALYSIS_VERSION,
+                            'analysis': analyze(text)}
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.path)
+        with self._lock:
+            self._pinned = {key: entry['analysis'] for key, entry in entries.items()}
+        return len(entries)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'precomputed': len(self._pinned or {}),
+                'recent': len(self._recent),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+cache = AnalysisCache()
+
+def init_app(app):
+    cache.configure(
+        path=app.config.get('TOPIC_ANALYSIS_PATH') or os.path.join(app.instance_path, 'topic_analysis.json'),
+        max_entries=app.config.get('TOPIC_ANALYSIS_CACHE_SIZE', 1024),
+        enabled=app.config.get('TOPIC_ANALYSIS_ENABLED', True),
+    )
+
+def hint_for(topic_text):
+    """题目的任务分析提示；关闭或题型未识别时返回 None"""
+    if not cache.enabled or not topic_text:
+        return None
+    return format_hint(cache.get(topic_text))
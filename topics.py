@@ -0,0 +1,222 @@
+"""
+题目服务：内存中的题目索引、关键词搜索和不重复的随机抽题
+
+- 倒排索引：关键词 -> 题目序号（升序列表），多个关键词取交集；
+  词表排好序，前缀查询用二分找到词表区间（输入 "tech" 可以匹配 technology）
+- 分类标签：按关键词词干规则给题目打标签（education、technology ...），同样建倒排
+- 随机抽题：每个用户一个"洗牌游标" (种子, 位置)。序号 i 经过以种子为密钥的
+  Feistel 置换映射到题目，一轮之内不会重复；状态只有两个整数，存在 session 里，
+  不需要为每个用户保存整个打乱后的列表，题目数量再多也一样
+"""
+
+import bisect
+import functools
+import hashlib
+import re
+import secrets
+import threading
+
+from flask import current_app, session
+
+from reference_data import load_hot_topics
+
+WORD_RE = re.compile(r"[a-z]+")
+
+STOPWORDS = {
+    'a', 'about', 'all', 'also', 'an', 'and', 'any', 'are', 'as', 'at', 'be', 'been', 'both',
+    'but', 'by', 'can', 'do', 'does', 'for', 'from', 'give', 'has', 'have', 'how', 'if', 'in',
+    'into', 'is', 'it', 'its', 'more', 'most', 'of', 'on', 'one', 'or', 'other', 'others',
+    'own', 'should', 'so', 'some', 'such', 'than', 'that', 'the', 'their', 'them', 'there',
+    'these', 'they', 'think', 'this', 'to', 'what', 'when', 'which', 'while', 'who', 'why',
+    'will', 'with', 'would', 'you', 'your', 'people', 'believe', 'discuss', 'views', 'opinion',
+    'agree', 'disagree', 'extent', 'reasons', 'examples', 'answer', 'include', 'relevant',
+}
+
+# 分类 -> 关键词词干：题目中有单词以词干开头即打上该标签；
+# 少于 4 个字母的词干（car、tv ...）必须整词匹配，避免 car 匹配到 career
+CATEGORY_RULES = {
+    'education': ('educat', 'school', 'universit', 'student', 'teach', 'learn', 'librar', 'study', 'illitera', 'uniform'),
+    'technology': ('technolog', 'internet', 'phone', 'computer', 'online', 'driverless', 'social network', 'robot', 'digital'),
+    'environment': ('environment', 'pollut', 'climate', 'energy', 'zoo', 'zoos', 'animal', 'nature', 'wildlife'),
+    'health': ('health', 'overweight', 'obes', 'food', 'medicine', 'drug', 'sport', 'exercise', 'mental', 'physical'),
+    'work': ('job', 'jobs', 'work', 'compan', 'salar', 'career', 'employ', 'executive', 'ceo', 'ceos'),
+    'society': ('societ', 'elderly', 'famil', 'children', 'teenage', 'women', 'wedding', 'culture', 'competitiv', 'happiness', 'citie', 'city', 'urban'),
+    'government': ('government', 'law', 'laws', 'ban', 'banned', 'polic', 'military', 'public', 'tax', 'fund', 'control'),
+    'transport': ('transport', 'traffic', 'car', 'cars', 'bus', 'buses', 'vehicle', 'road'),
+    'economy': ('econom', 'wealth', 'rich', 'poor', 'money', 'spend', 'agricultur'),
+    'media': ('media', 'television', 'tv', 'news', 'advertis', 'violence', 'information', 'film'),
+}
+
+def tokenize(text):
+    return WORD_RE.findall(text.lower())
+
+def keywords(text):
+    return {w for w in tokenize(text) if w not in STOPWORDS and len(w) > 1}
+
+def categorize(text):
+    """按 CATEGORY_RULES 给题目打标签（顺序与 CATEGORY_RULES 一致）"""
+    words = tokenize(text)
+    found = set()
+    for word in set(words):
+        found.update(_word_categories(word))
+    lowered = f" {' '.join(words)} "
+    for phrase, category in _PHRASE_RULES:
+        if f' {phrase}' in lowered:
+            found.add(category)
+    return [category for category in CATEGORY_RULES if category in found]
+
+_PHRASE_RULES = [(stem, category) for category, stems in CATEGORY_RULES.items()
+                 for stem in stems if ' ' in stem]
+
+@functools.lru_cache(maxsize=65536)
+def _word_categories(word):
+    """单个单词命中的分类；题库里的单词大量重复，按词缓存"""
+    return frozenset(
+        category for category, stems in CATEGORY_RULES.items()
+        if any(' ' not in stem and (word == stem if len(stem) < 4 else word.startswith(stem))
+               for stem in stems)
+    )
+
+class TopicIndex:
+    def __init__(self, topics):
+        """topics: {topic_id: topic_text}"""
+        self.ids = sorted(topics)
+        self.texts = [topics[i] for i in self.ids]
+        self.categories = [categorize(t) for t in self.texts]
+        self.position = {topic_id: n for n, topic_id in enumerate(self.ids)}
+
+        postings = {}
+        for n, text in enumerate(self.texts):
+            for word in keywords(text):
+                postings.setdefault(word, []).append(n)
+        self.postings = postings
+        self.vocabulary = sorted(postings)
+
+        self.by_category = {}
+        for n, tags in enumerate(self.categories):
+            for tag in tags:
+                self.by_category.setdefault(tag, []).append(n)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def topic(self, n):
+        return {
+            'topic_id': self.ids[n],
+            'topic_text': self.texts[n],
+            'categories': self.categories[n],
+        }
+
+    def get(self, topic_id):
+        n = self.position.get(topic_id)
+        return None if n is None else self.topic(n)
+
+    def prefix_matches(self, term):
+        """以 term 为前缀的所有题目序号"""
+        start = bisect.bisect_left(self.vocabulary, term)
+        matched = set()
+        for word in self.vocabulary[start:]:
+            if not word.startswith(term):
+                break
+            matched.update(self.postings[word])
+        return matched
+
+    def _has_longer_words(self, term):
+        """词表中是否还有以 term 为前缀的其他单词"""
+        n = bisect.bisect_right(self.vocabulary, term)
+        return n < len(self.vocabulary) and self.vocabulary[n].startswith(term)
+
+    def search(self, query='', category=None, limit=20):
+        """
+        每个查询词都按前缀匹配，多个词取交集；按题目序号排序。
+        返回 (命中总数, 前 limit 条)
+        """
+        terms = keywords(query)
+        if not category and len(terms) == 1:
+            # 最常见的情况：单个完整关键词，直接返回倒排列表
+            postings = self.postings.get(next(iter(terms)))
+            if postings is not None and not self._has_longer_words(next(iter(terms))):
+                return len(postings), [self.topic(n) for n in postings[:limit]]
+
+        candidates = None
+        if category:
+            candidates = set(self.by_category.get(category, ()))
+        for term in sorted(terms, key=len, reverse=True):
+            matched = self.prefix_matches(term)
+            candidates = matched if candidates is None else candidates & matched
+            if not candidates:
+                break
+        if candidates is None:
+            candidates = range(len(self.ids))
+        ordered = sorted(candidates)
+        return len(ordered), [self.topic(n) for n in ordered[:limit]]
+
+    def category_counts(self):
+        return {tag: len(members) for tag, members in sorted(self.by_category.items())}
+
+class ShuffledCursor:
+    """
+    [0, size) 上由种子决定的伪随机置换（4 轮 Feistel + cycle walking）。
+    permute(0), permute(1), ... permute(size - 1) 恰好是 0..size-1 的一个排列
+    """
+
+    ROUNDS = 4
+
+    def __init__(self, seed, size):
+        self.size = size
+        self.key = seed.to_bytes(8, 'big')
+        half_bits = max(1, ((size - 1).bit_length() + 1) // 2)
+        self.half_bits = half_bits
+        self.mask = (1 << half_bits) - 1
+
+    def _round(self, r, value):
+        digest = hashlib.blake2b(value.to_bytes(4, 'big'), digest_size=4,
+                                 key=self.key, person=bytes([r]) * 16).digest()
+        return int.from_bytes(digest, 'big') & self.mask
+
+    def _feistel(self, x):
+        left, right = x >> self.half_bits, x & self.mask
+        for r in range(self.ROUNDS):
+            left, right = right, left ^ self._round(r, right)
+        return (left << self.half_bits) | right
+
+    def permute(self, i):
+        # 定义域是 4^half_bits >= size，落在范围外就继续置换，直到回到 [0, size)
+        x = self._feistel(i)
+        while x >= self.size:
+            x = self._feistel(x)
+        return x
+
+_index_lock = threading.Lock()
+
+def get_index():
+    """题目索引在第一次使用时从 hottopic.json 构建，之后常驻内存"""
+    index = current_app.extensions.get('topic_index')
+    if index is None:
+        with _index_lock:
+            index = current_app.extensions.get('topic_index')
+            if index is None:
+                index = TopicIndex(load_hot_topics())
+                current_app.extensions['topic_index'] = index
+    return index
+
+CURSOR_KEY = 'topic_cursor'
+
+def next_random_topic(owner):
+    """
+    为 owner（用户 id，匿名用户为 None）抽下一道题：
+    session 中保存 [owner, 种子, 已抽数量, 题目总数]，一轮抽完或题库变化后换新种子
+    """
+    index = get_index()
+    size = len(index)
+    if not size:
+        return None
+
+    state = session.get(CURSOR_KEY)
+    if not state or state[0] != owner or state[3] != size or state[2] >= size:
+        state = [owner, secrets.randbits(63), 0, size]
+
+    _, seed, position, _ = state
+    n = ShuffledCursor(seed, size).permute(position)
+    session[CURSOR_KEY] = [owner, seed, position + 1, size]
+    return index.topic(n)
@@ -0,0 +1,18 @@
+"""
+生产环境入口，例如：
+
+    gunicorn --preload -w 4 wsgi:app
+
+默认使用生产配置（需要设置 SECRET_KEY、DATABASE_URL），可用 APP_CONFIG 覆盖。
+preload 模式下主进程只导入模块、不打开数据库连接；
+各 worker fork 之后会重新建立自己的连接池。
+"""
+
+import os
+
+from app import create_app, preload_heavy_modules
+
+app = create_app(os.environ.get('APP_CONFIG', 'production'))
+
+if app.config.get('PRELOAD_HEAVY_MODULES'):
+    preload_heavy_modules()